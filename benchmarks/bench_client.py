@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+"""Throughput and latency of the client against an in-process fake harbor.
+
+Runs the crawl, bulk-delete and tag-listing workloads against FakeHarbor
+with a fixed data set, latency and error rate, and reports operations per
+second and the p50/p99 latency of the requests sent. Results can be saved
+with --save and later runs checked against them with --compare, which
+exits non-zero when a workload got slower than --tolerance allows.
+
+    python benchmarks/bench_client.py
+    python benchmarks/bench_client.py --save baseline.json
+    python benchmarks/bench_client.py --compare baseline.json
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from harborclient.fakeharbor import FakeHarbor
+from harborclient.harborclient import HarborClient
+from harborclient.metrics import Hook
+
+WORKLOADS = ('crawl', 'bulk-delete', 'tag-listing')
+
+
+class LatencyRecorder(Hook):
+    """Keeps the latency of every request sent."""
+
+    def __init__(self):
+        self.latencies = []
+        self._lock = threading.Lock()
+
+    def on_request(self, event, span):
+        with self._lock:
+            self.latencies.append(event.latency)
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def crawl(client, harbor, args):
+    return sum(1 for _ in client.crawl(manifests=True, workers=args.workers))
+
+
+def bulk_delete(client, harbor, args):
+    items = [(name, tag) for name, repo in sorted(harbor.repositories.items())
+             for tag in sorted(repo['tags'])]
+    results = client.bulk_delete_repositories(items, workers=args.workers)
+    return sum(1 for result in results if result.ok)
+
+
+def tag_listing(client, harbor, args):
+    names = sorted(harbor.repositories) * args.rounds
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        return sum(1 for tags in executor.map(client.get_repository_tags,
+                                              names) if tags is not None)
+
+
+def run(workload, args):
+    harbor = FakeHarbor(projects=args.projects,
+                        repositories=args.repositories,
+                        tags=args.tags,
+                        latency=args.latency,
+                        error_rate=args.error_rate,
+                        seed=args.seed)
+    recorder = LatencyRecorder()
+    with harbor:
+        with HarborClient(harbor.host, harbor.user, harbor.password,
+                          threads=args.workers, hooks=[recorder]) as client:
+            client.login()
+            func = {'crawl': crawl,
+                    'bulk-delete': bulk_delete,
+                    'tag-listing': tag_listing}[workload]
+            start = time.time()
+            operations = func(client, harbor, args)
+            elapsed = time.time() - start
+    return {'operations': operations,
+            'requests': len(recorder.latencies),
+            'seconds': elapsed,
+            'throughput': operations / elapsed,
+            'p50': percentile(recorder.latencies, 0.5),
+            'p99': percentile(recorder.latencies, 0.99)}
+
+
+def best(results):
+    # The fastest repetition is the least disturbed by the machine
+    return max(results, key=lambda result: result['throughput'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('workloads', nargs='*', default=list(WORKLOADS),
+                        help='workloads to run, default all of %s' %
+                        ', '.join(WORKLOADS))
+    parser.add_argument('--projects', type=int, default=5)
+    parser.add_argument('--repositories', type=int, default=20,
+                        help='repositories per project')
+    parser.add_argument('--tags', type=int, default=10,
+                        help='tags per repository')
+    parser.add_argument('--latency', type=float, default=0.002,
+                        help='seconds the fake harbor waits per request')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='fraction of requests failing with 503')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--rounds', type=int, default=5,
+                        help='times tag-listing lists every repository')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--save', help='write the results to this file')
+    parser.add_argument('--compare', help='results file to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='allowed throughput drop when comparing')
+    args = parser.parse_args()
+
+    for workload in args.workloads:
+        if workload not in WORKLOADS:
+            parser.error('unknown workload %s' % workload)
+
+    results = {}
+    print('%-12s %8s %8s %10s %9s %9s' % ('workload', 'ops', 'requests',
+                                          'ops/s', 'p50 ms', 'p99 ms'))
+    for workload in args.workloads:
+        result = best([run(workload, args) for _ in range(args.repeat)])
+        results[workload] = result
+        print('%-12s %8d %8d %10.1f %9.2f %9.2f' %
+              (workload, result['operations'], result['requests'],
+               result['throughput'], result['p50'] * 1000,
+               result['p99'] * 1000))
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = []
+        for workload, result in sorted(results.items()):
+            if workload not in baseline:
+                continue
+            before = baseline[workload]['throughput']
+            change = result['throughput'] / before - 1
+            print('%-12s %+.1f%% throughput' % (workload, change * 100))
+            if change < -args.tolerance:
+                regressions.append(workload)
+        if regressions:
+            print('Regressed: %s' % ', '.join(regressions))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+"""Per-call cost of the debug log statements of the read endpoints.
+
+Compares the eager statement the client used to run after every successful
+read, logging.debug("...: {}".format(result)), with the lazy one it runs
+now, at a disabled and an enabled debug level and for growing payloads.
+
+    python benchmarks/bench_logging.py
+"""
+
+import argparse
+import logging
+import os
+import timeit
+
+from harborclient.harborclient import _Payload
+
+logger = logging.getLogger('bench_logging')
+
+
+def payload(size):
+    # Shaped like a page of GET /api/projects
+    return [{'project_id': index,
+             'name': 'project%d' % index,
+             'owner_id': 1,
+             'public': index % 2,
+             'creation_time': '2016-07-27T09:45:31Z',
+             'repo_count': index % 7} for index in range(size)]
+
+
+def eager(result):
+    logger.debug("Successfully get projects result: {}".format(result))
+
+
+def lazy(result):
+    logger.debug("Successfully get projects result: %s", _Payload(result))
+
+
+def measure(func, result, number):
+    return min(timeit.repeat(lambda: func(result), number=number,
+                             repeat=3)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10,100,1000,10000',
+                        help='comma separated payload sizes in items')
+    parser.add_argument('--number', type=int, default=200,
+                        help='calls per measurement')
+    args = parser.parse_args()
+
+    # Records are formatted by the handler, so write them to /dev/null
+    logger.addHandler(logging.StreamHandler(open(os.devnull, 'w')))
+    logger.propagate = False
+
+    print('%-8s %-6s %14s %14s %8s' % ('items', 'debug', 'eager us/call',
+                                       'lazy us/call', 'speedup'))
+    for size in [int(s) for s in args.sizes.split(',')]:
+        result = payload(size)
+        for level in (logging.INFO, logging.DEBUG):
+            logger.setLevel(level)
+            before = measure(eager, result, args.number)
+            after = measure(lazy, result, args.number)
+            print('%-8d %-6s %14.2f %14.2f %7.0fx' %
+                  (size, 'on' if level == logging.DEBUG else 'off',
+                   before * 1e6, after * 1e6, before / after))
+
+
+if __name__ == '__main__':
+    main()
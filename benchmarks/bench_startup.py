@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+"""Cold-start cost of short-lived processes using the client.
+
+Runs each case in a fresh interpreter against a FakeHarbor and reports the
+median wall time above a bare `python -c pass`: importing the client, one
+`harbor` command logging in, and the same command reusing a session from
+`harbor login`. Set PYTHONPYCACHEPREFIX when bytecode is not written next
+to the sources, otherwise every run compiles them again.
+
+    PYTHONPATH=. python benchmarks/bench_startup.py
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+from harborclient.fakeharbor import FakeHarbor
+
+
+def run(argv):
+    start = time.time()
+    subprocess.check_call([sys.executable] + argv, stdout=subprocess.DEVNULL)
+    return time.time() - start
+
+
+def median(argv, repeat):
+    times = sorted(run(argv) for _ in range(repeat))
+    return times[len(times) // 2]
+
+
+def import_times():
+    # Cumulative microseconds of the heaviest imports, from -X importtime
+    output = subprocess.check_output(
+        [sys.executable, '-X', 'importtime', '-c',
+         'import harborclient.harborclient'], stderr=subprocess.STDOUT,
+        universal_newlines=True)
+    times = {}
+    for line in output.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            _, cumulative, name = line.split('|')
+            if cumulative.strip().isdigit():
+                times[name.strip()] = int(cumulative)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=9,
+                        help='runs per case, the median is reported')
+    args = parser.parse_args()
+
+    with FakeHarbor() as harbor:
+        base = ['-m', 'harborclient.cli', 'get-statistics', '--host',
+                harbor.host, '--user', harbor.user, '--password',
+                harbor.password]
+        session_id = json.loads(subprocess.check_output(
+            [sys.executable, '-m', 'harborclient.cli', 'login', '--host',
+             harbor.host, '--user', harbor.user, '--password',
+             harbor.password]))['session_id']
+        cases = [
+            ('python -c pass', ['-c', 'pass']),
+            ('import harborclient', ['-c',
+                                     'import harborclient.harborclient']),
+            ('harbor get-statistics', base),
+            ('... --session-id', base + ['--session-id', session_id]),
+        ]
+        baseline = None
+        print('%-24s %10s %10s' % ('case', 'ms', 'over bare'))
+        for name, argv in cases:
+            elapsed = median(argv, args.repeat)
+            baseline = elapsed if baseline is None else baseline
+            print('%-24s %10.1f %10.1f' % (name, elapsed * 1e3,
+                                          (elapsed - baseline) * 1e3))
+
+    times = import_times()
+    print('\n%-32s %10s' % ('import', 'ms'))
+    for name in sorted(times, key=times.get, reverse=True)[:8]:
+        print('%-32s %10.1f' % (name, times[name] / 1e3))
+
+
+if __name__ == '__main__':
+    main()
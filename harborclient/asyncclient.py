@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from harborclient.harborclient import HarborClient
+
+# Public HarborClient methods exposed as coroutines
+ASYNC_METHODS = (
+    'login',
+    'logout',
+    'get_project_id_from_name',
+    'search',
+    'get_projects',
+    'check_project_exist',
+    'create_project',
+    'set_project_publicity',
+    'get_statistics',
+    'get_users',
+    'create_user',
+    'update_user_profile',
+    'delete_user',
+    'change_password',
+    'promote_as_admin',
+    'get_repositories',
+    'delete_repository',
+    'get_repository_tags',
+    'get_repository_manifests',
+    'get_top_accessed_repositories',
+    'get_logs',
+    'bulk',
+    'bulk_delete_repositories',
+    'bulk_create_projects',
+    'bulk_set_project_publicity',
+    'bulk_delete_users',
+)
+
+
+class AsyncHarborClient(object):
+    """Asyncio adapter of HarborClient backed by threads.
+
+    This is not an async transport, each coroutine runs the matching
+    blocking HarborClient call on a pool of `concurrency` threads sharing
+    one pooled session. That many calls are in flight at most, the rest
+    queue in the pool, so thousands of calls can be gathered at once
+    without opening thousands of connections or threads.
+    """
+
+    def __init__(self, host, user, password, protocol="http", concurrency=10,
+                 client=None):
+        self.concurrency = concurrency
+        self._owns_client = client is None
+        if client is None:
+            client = HarborClient(host, user, password, protocol,
+                                  pool_maxsize=concurrency,
+                                  pool_block=True)
+        self.client = client
+        # The only limit on calls in flight
+        self._executor = ThreadPoolExecutor(max_workers=concurrency)
+
+    async def _call(self, name, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor,
+            functools.partial(getattr(self.client, name), *args, **kwargs))
+
+    async def close(self):
+        if self._owns_client:
+            await self._call('close')
+        self._executor.shutdown(wait=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+
+def _coroutine_method(name):
+    async def method(self, *args, **kwargs):
+        return await self._call(name, *args, **kwargs)
+
+    method.__name__ = name
+    method.__doc__ = getattr(HarborClient, name).__doc__
+    return method
+
+
+for _name in ASYNC_METHODS:
+    setattr(AsyncHarborClient, _name, _coroutine_method(_name))
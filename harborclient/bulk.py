@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+
+import logging
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from harborclient.ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Outcome of one item of a bulk call. result is what the client method
+# returned, status_code the HTTP status of its last response and latency the
+# call duration in seconds.
+BulkResult = namedtuple(
+    'BulkResult', ['item', 'ok', 'result', 'status_code', 'latency', 'error'])
+
+
+def run_bulk(client, method, items, workers=8, rate=None):
+    """Call client.<method> once per item on a pool of `workers` threads.
+
+    An item is a tuple of positional arguments, a dict of keyword arguments
+    or a single argument. `rate` caps the number of calls per second. One
+    BulkResult is returned per item, in the order of the items.
+    """
+    func = getattr(client, method)
+    bucket = TokenBucket(rate) if rate else None
+
+    def call(item):
+        if bucket is not None:
+            bucket.acquire()
+        start = time.time()
+        status_code = None
+        # A status left by the previous item must not be reported for this
+        # one when it sends nothing
+        client.last_response = None
+        try:
+            if isinstance(item, dict):
+                result = func(**item)
+            elif isinstance(item, tuple):
+                result = func(*item)
+            else:
+                result = func(item)
+            error = None
+        except Exception as e:
+            result, error = None, e
+        latency = time.time() - start
+        response = client.last_response
+        if response is not None:
+            status_code = response.status_code
+        ok = error is None and result is not None and result is not False
+        if not ok and error is None:
+            error = "{} failed with response code: {}".format(method,
+                                                               status_code)
+        return BulkResult(item, ok, result, status_code, latency, error)
+
+    results = []
+    executor = ThreadPoolExecutor(max_workers=workers)
+    pending = {}
+    try:
+        # Keep a bounded number of items queued so huge inputs can be
+        # generators
+        for index, item in enumerate(items):
+            if len(pending) >= workers * 2:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results.append((pending.pop(future), future.result()))
+            pending[executor.submit(call, item)] = index
+        for future in pending:
+            results.append((pending[future], future.result()))
+    finally:
+        executor.shutdown(wait=True)
+
+    results.sort(key=lambda result: result[0])
+    results = [result for _, result in results]
+    failed = len([r for r in results if not r.ok])
+    if failed:
+        logger.error("Fail to %s %s of %s items", method, failed, len(results))
+    return results
@@ -0,0 +1,287 @@
+#!/usr/bin/env python
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Returned by get() when a key is missing or expired
+MISSING = object()
+
+# Default time to live in seconds of the cached read endpoints
+DEFAULT_TTLS = {
+    'get_project_id_from_name': 300,
+    'get_projects': 60,
+    'search': 30,
+    'get_statistics': 30,
+    'get_users': 60,
+    'get_repositories': 60,
+    'get_repository_tags': 30,
+    'get_repository_manifests': 300,
+    'get_top_accessed_repositories': 30,
+}
+
+# Cached read endpoints that each write endpoint makes stale
+INVALIDATIONS = {
+    'create_project': ('get_projects', 'get_project_id_from_name', 'search',
+                       'get_statistics'),
+    'set_project_publicity': ('get_projects', 'search', 'get_statistics'),
+    'create_user': ('get_users', ),
+    'update_user_profile': ('get_users', ),
+    'delete_user': ('get_users', ),
+    'promote_as_admin': ('get_users', ),
+    'delete_repository': ('get_repositories', 'get_repository_tags',
+                          'get_repository_manifests', 'search',
+                          'get_statistics', 'get_top_accessed_repositories'),
+}
+
+
+class ResponseCache(object):
+    """In-process TTL and LRU cache of parsed read responses.
+
+    Keys are (host, endpoint, arguments) tuples, the client puts its
+    protocol and user first in the arguments. Entries expire after the
+    endpoint's TTL and the least recently used entry is evicted once maxsize
+    is reached. Cached objects are shared between callers and should be
+    treated as read-only.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60, ttls=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.ttls = dict(DEFAULT_TTLS)
+        self.ttls.update(ttls or {})
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.endpoint_stats = {}
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > time.time():
+                self._data.move_to_end(key)
+                self._count(key[1], 0)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._data[key]
+            self._count(key[1], 1)
+            self.misses += 1
+            return MISSING
+
+    def set(self, key, value):
+        ttl = self.ttls.get(key[1], self.ttl)
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.time() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, host, endpoints):
+        endpoints = set(endpoints)
+        with self._lock:
+            for key in [k for k in self._data
+                        if k[0] == host and k[1] in endpoints]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits,
+                    'misses': self.misses,
+                    'evictions': self.evictions,
+                    'size': len(self._data),
+                    'endpoints': dict((k, {'hits': v[0], 'misses': v[1]})
+                                      for k, v in self.endpoint_stats.items())}
+
+    def __len__(self):
+        return len(self._data)
+
+    def _count(self, endpoint, index):
+        counters = self.endpoint_stats.setdefault(endpoint, [0, 0])
+        counters[index] += 1
+
+
+class DiskCache(object):
+    """Persistent cache of parsed read responses backed by sqlite.
+
+    It takes the place of ResponseCache when several short-lived processes
+    on one machine should share a warm cache. The database runs in WAL mode
+    so readers never block on writers, each thread and process opens its own
+    connection, and writers wait up to `timeout` seconds for the lock. Rows
+    expire after the endpoint's TTL and the oldest rows are dropped once
+    more than maxsize are stored.
+    """
+
+    def __init__(self, path, maxsize=100000, ttl=60, ttls=None, timeout=30):
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.ttls = dict(DEFAULT_TTLS)
+        self.ttls.update(ttls or {})
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+        connection = self._connection()
+        connection.execute('CREATE TABLE IF NOT EXISTS cache ('
+                           'host TEXT, endpoint TEXT, params TEXT, '
+                           'value TEXT, expires REAL, stored REAL, '
+                           'PRIMARY KEY (host, endpoint, params))')
+        connection.execute('CREATE INDEX IF NOT EXISTS cache_stored '
+                           'ON cache (stored)')
+
+    def _connection(self):
+        # sqlite connections can not be shared across threads or forks
+        pid = os.getpid()
+        if getattr(self._local, 'pid', None) != pid:
+            import sqlite3
+
+            connection = sqlite3.connect(self.path, timeout=self.timeout,
+                                         isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+            self._local.pid = pid
+        return self._local.connection
+
+    def get(self, key):
+        host, endpoint, params = key
+        row = self._connection().execute(
+            'SELECT value FROM cache WHERE host = ? AND endpoint = ? AND '
+            'params = ? AND expires > ?',
+            (host, endpoint, json.dumps(params), time.time())).fetchone()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return MISSING
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        host, endpoint, params = key
+        ttl = self.ttls.get(endpoint, self.ttl)
+        if ttl <= 0:
+            return
+        now = time.time()
+        connection = self._connection()
+        connection.execute(
+            'INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?, ?)',
+            (host, endpoint, json.dumps(params), json.dumps(value), now + ttl,
+             now))
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % 100 == 1
+        if prune:
+            self.prune(connection)
+
+    def prune(self, connection=None):
+        # Drop expired rows, then the oldest ones above maxsize
+        connection = connection or self._connection()
+        connection.execute('DELETE FROM cache WHERE expires <= ?',
+                           (time.time(), ))
+        connection.execute(
+            'DELETE FROM cache WHERE rowid IN (SELECT rowid FROM cache '
+            'ORDER BY stored DESC LIMIT -1 OFFSET ?)', (self.maxsize, ))
+
+    def invalidate(self, host, endpoints):
+        endpoints = list(endpoints)
+        self._connection().execute(
+            'DELETE FROM cache WHERE host = ? AND endpoint IN (%s)' %
+            ', '.join('?' * len(endpoints)), [host] + endpoints)
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache')
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self)}
+
+    def __len__(self):
+        return self._connection().execute(
+            'SELECT COUNT(*) FROM cache').fetchone()[0]
+
+
+class ValidatorCache(object):
+    """Remembers ETag and Last-Modified validators per URL.
+
+    Each entry keeps the parsed body of the last 200 response so a 304 Not
+    Modified answer can be served without transferring or parsing the body
+    again. At most maxsize URLs are remembered, least recently used first
+    out.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def headers(self, url):
+        # Conditional request headers for the url, empty when unknown
+        with self._lock:
+            entry = self._data.get(url)
+        headers = {}
+        if entry is not None:
+            if entry[0]:
+                headers['If-None-Match'] = entry[0]
+            if entry[1]:
+                headers['If-Modified-Since'] = entry[1]
+        return headers
+
+    def not_modified(self, url):
+        with self._lock:
+            entry = self._data.get(url)
+            if entry is None:
+                self.misses += 1
+                return MISSING
+            self._data.move_to_end(url)
+            self.hits += 1
+            return entry[2]
+
+    def update(self, url, response, data):
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if not etag and not last_modified:
+            return
+        with self._lock:
+            self._data[url] = (etag, last_modified, data)
+            self._data.move_to_end(url)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class ParsedResponse(object):
+    """Response whose JSON body is already parsed.
+
+    Stands in for the requests response of a conditional request, either
+    carrying the remembered body of a 304 or the freshly parsed body of a
+    200, so json() never parses twice.
+    """
+
+    def __init__(self, response, data, not_modified=False):
+        self.response = response
+        self.status_code = 200
+        self.headers = response.headers
+        self.request = response.request
+        self.not_modified = not_modified
+        self._data = data
+
+    def json(self):
+        return self._data
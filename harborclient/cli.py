@@ -0,0 +1,325 @@
+#!/usr/bin/env python
+
+import argparse
+import json
+import os
+import shlex
+import sys
+from collections import deque
+
+from harborclient.harborclient import HarborClient
+from harborclient.models import to_json
+
+# Request/response calls, one command each named with dashes
+COMMANDS = (
+    'get_project_id_from_name',
+    'search',
+    'get_projects',
+    'check_project_exist',
+    'create_project',
+    'set_project_publicity',
+    'get_statistics',
+    'get_users',
+    'create_user',
+    'update_user_profile',
+    'delete_user',
+    'change_password',
+    'promote_as_admin',
+    'get_repositories',
+    'delete_repository',
+    'get_repository_tags',
+    'get_repository_manifests',
+    'get_top_accessed_repositories',
+    'get_logs',
+)
+
+# Listings printed one item per line as they arrive
+ITER_COMMANDS = (
+    'iter_projects',
+    'iter_users',
+    'iter_repositories',
+    'iter_logs',
+    'crawl',
+)
+
+
+def _boolean(value):
+    if value.lower() in ('1', 'true', 'yes', 'on'):
+        return True
+    if value.lower() in ('0', 'false', 'no', 'off'):
+        return False
+    raise ValueError("not a boolean: %s" % value)
+
+
+# Parameters which are not strings, arguments are converted by name
+CONVERTERS = {
+    'project_id': int,
+    'user_id': int,
+    'count': int,
+    'lines': int,
+    'start_time': int,
+    'end_time': int,
+    'page_size': int,
+    'workers': int,
+    'is_public': _boolean,
+    'prefetch': _boolean,
+    'stream': _boolean,
+    'manifests': _boolean,
+}
+
+# Calls waiting to be printed per worker, bounds memory on long inputs
+_WINDOW = 4
+
+# Default of the parameters which have none
+_REQUIRED = object()
+
+
+def _parameters(name):
+    # (name, default) of each parameter after self, read from the function
+    # under the decorators like _typed does, inspect is slow to import
+    func = getattr(HarborClient, name)
+    while hasattr(func, '__wrapped__'):
+        func = func.__wrapped__
+    code = func.__code__
+    names = code.co_varnames[1:code.co_argcount]
+    defaults = func.__defaults__ or ()
+    return list(zip(names, (_REQUIRED, ) * (len(names) - len(defaults)) +
+                    defaults))
+
+
+def _usage(name):
+    words = []
+    for parameter, default in _parameters(name):
+        if default is _REQUIRED:
+            words.append(parameter)
+        else:
+            words.append('[%s]' % parameter)
+    return ' '.join([name.replace('_', '-')] + words)
+
+
+def build_parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--host', default=os.environ.get('HARBOR_HOST'),
+                        help="harbor host, default $HARBOR_HOST")
+    common.add_argument('--user', default=os.environ.get('HARBOR_USER'),
+                        help="default $HARBOR_USER")
+    common.add_argument('--password',
+                        default=os.environ.get('HARBOR_PASSWORD'),
+                        help="default $HARBOR_PASSWORD")
+    common.add_argument('--session-id',
+                        default=os.environ.get('HARBOR_SESSION_ID'),
+                        help="session of `harbor login` to skip logging in, "
+                        "default $HARBOR_SESSION_ID")
+    common.add_argument('--protocol',
+                        default=os.environ.get('HARBOR_PROTOCOL', 'http'))
+    common.add_argument('--parallel', type=int, default=1, metavar='N',
+                        help="run up to N calls of the batch at a time")
+    common.add_argument('--input', action='append', metavar='FILE',
+                        help="run one call per line of FILE, - for stdin")
+
+    parser = argparse.ArgumentParser(
+        prog='harbor',
+        description="Call the harbor API and print JSON Lines. Every line "
+        "of --input holds the arguments of one call, as a JSON array, a "
+        "JSON object of keyword arguments or shell quoted words, and is "
+        "printed as {\"input\", \"ok\", \"status_code\", \"result\", "
+        "\"error\"} in input order.")
+    commands = parser.add_subparsers(dest='command', metavar='COMMAND')
+    commands.required = True
+    login = commands.add_parser('login', parents=[common],
+                                help="log in and print the session id")
+    login.set_defaults(method='login', args=[])
+    for name in COMMANDS + ITER_COMMANDS:
+        command = commands.add_parser(name.replace('_', '-'),
+                                      parents=[common], help=_usage(name),
+                                      usage='harbor %s [options]' %
+                                      _usage(name))
+        command.set_defaults(method=name)
+        command.add_argument('args', nargs='*', help=argparse.SUPPRESS)
+        for parameter, default in _parameters(name):
+            if default is not _REQUIRED:
+                command.add_argument(
+                    '--' + parameter.replace('_', '-'),
+                    dest='kw_' + parameter, default=argparse.SUPPRESS,
+                    metavar=parameter.upper())
+    return parser
+
+
+def _convert(name, value):
+    converter = CONVERTERS.get(name)
+    if converter is None or not isinstance(value, str):
+        return value
+    return converter(value)
+
+
+def _bind(method, args, kwargs):
+    # Call arguments checked against the method signature and converted
+    parameters = _parameters(method)
+    names = [name for name, _ in parameters]
+    if len(args) > len(names):
+        raise TypeError("%s takes at most %d arguments" % (method,
+                                                           len(names)))
+    arguments = dict(zip(names, args))
+    for name, value in kwargs.items():
+        if name not in names:
+            raise TypeError("%s got an unexpected argument '%s'" %
+                            (method, name))
+        if name in arguments:
+            raise TypeError("%s got multiple values for argument '%s'" %
+                            (method, name))
+        arguments[name] = value
+    missing = [name for name, default in parameters
+               if default is _REQUIRED and name not in arguments]
+    if missing:
+        raise TypeError("%s missing required argument: %s" %
+                        (method, ', '.join("'%s'" % name
+                                           for name in missing)))
+    return dict((name, _convert(name, value))
+                for name, value in arguments.items())
+
+
+def _parse_line(line):
+    line = line.strip()
+    if not line or line.startswith('#'):
+        return None
+    if line[0] in '[{':
+        value = json.loads(line)
+        return value if isinstance(value, dict) else list(value)
+    return shlex.split(line)
+
+
+def _read_inputs(paths, stdin):
+    for path in paths:
+        stream = stdin if path == '-' else open(path)
+        try:
+            for line in stream:
+                item = _parse_line(line)
+                if item is not None:
+                    yield item
+        finally:
+            if stream is not stdin:
+                stream.close()
+
+
+def _jsonable(value):
+    if hasattr(value, '_asdict'):
+        return dict((key, _jsonable(item))
+                    for key, item in value._asdict().items())
+    return to_json(value)
+
+
+def _write(stdout, value):
+    stdout.write(json.dumps(value) + '\n')
+    stdout.flush()
+
+
+def _call(client, method, base_args, base_kwargs, item):
+    args = list(base_args)
+    kwargs = dict(base_kwargs)
+    if isinstance(item, dict):
+        kwargs.update(item)
+    elif item is not None:
+        args.extend(item)
+    record = {'input': item, 'ok': False, 'status_code': None,
+              'result': None, 'error': None}
+    # Workers are reused, a call sending nothing has no status of its own
+    client.last_response = None
+    try:
+        result = getattr(client, method)(**_bind(method, args, kwargs))
+        if method in ITER_COMMANDS:
+            result = [_jsonable(value) for value in result]
+        record['result'] = _jsonable(result)
+    except Exception as e:
+        record['error'] = '%s: %s' % (type(e).__name__, e)
+        return record
+    response = client.last_response
+    if response is not None:
+        record['status_code'] = response.status_code
+    record['ok'] = response is None or response.status_code < 400
+    return record
+
+
+def _threads(options, kwargs):
+    workers = 1
+    for name, default in _parameters(options.method):
+        if name == 'workers':
+            workers = _convert(name, kwargs.get(name, default))
+    return max(options.parallel, workers)
+
+
+def _run_batch(client, options, kwargs, items, stdout):
+    # Records are printed in input order as soon as the calls before them
+    # are done, with a bounded number of calls queued ahead
+    from concurrent.futures import ThreadPoolExecutor
+
+    ok = True
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=options.parallel) as executor:
+        for item in items:
+            pending.append(executor.submit(_call, client, options.method,
+                                           options.args, kwargs, item))
+            while len(pending) > options.parallel * _WINDOW:
+                record = pending.popleft().result()
+                ok = ok and record['ok']
+                _write(stdout, record)
+        while pending:
+            record = pending.popleft().result()
+            ok = ok and record['ok']
+            _write(stdout, record)
+    return ok
+
+
+def _run_single(client, options, kwargs, stdout, stderr):
+    try:
+        result = getattr(client, options.method)(
+            **_bind(options.method, options.args, kwargs))
+        if options.method in ITER_COMMANDS:
+            for value in result:
+                _write(stdout, _jsonable(value))
+        else:
+            _write(stdout, _jsonable(result))
+    except Exception as e:
+        stderr.write('harbor: %s: %s\n' % (type(e).__name__, e))
+        return False
+    response = client.last_response
+    return response is None or response.status_code < 400
+
+
+def main(argv=None, stdin=None, stdout=None, stderr=None):
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    stderr = stderr or sys.stderr
+    parser = build_parser()
+    options = parser.parse_args(argv)
+    if not options.host:
+        parser.error("--host or $HARBOR_HOST is required")
+    if options.parallel < 1:
+        parser.error("--parallel must be at least 1")
+    kwargs = dict((key[3:], value) for key, value in vars(options).items()
+                  if key.startswith('kw_'))
+
+    if options.method == 'login':
+        # Left logged in, the session is reused through --session-id
+        client = HarborClient(options.host, options.user, options.password,
+                              options.protocol)
+        session_id = client.login()
+        client.session.close()
+        _write(stdout, {'session_id': session_id})
+        return 0 if session_id else 1
+
+    # One client and one login for the whole batch, its connection pool
+    # sized for the batch workers or the workers of the call, whichever
+    # run more requests at a time
+    with HarborClient(options.host, options.user, options.password,
+                      options.protocol, threads=_threads(options, kwargs),
+                      session_id=options.session_id) as client:
+        if options.input:
+            ok = _run_batch(client, options, kwargs,
+                            _read_inputs(options.input, stdin), stdout)
+        else:
+            ok = _run_single(client, options, kwargs, stdout, stderr)
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+
+import fnmatch
+import logging
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from harborclient.models import to_json
+
+logger = logging.getLogger(__name__)
+
+# One crawled tag, manifest is None when manifests are not fetched. A
+# failed request is a record with error set, its repository or tag None
+# when the repository or tag listing failed.
+CrawlRecord = namedtuple('CrawlRecord',
+                         ['project', 'repository', 'tag', 'manifest',
+                          'error'])
+CrawlRecord.__new__.__defaults__ = (None, )
+
+_REPOSITORIES = 'repositories'
+_TAGS = 'tags'
+_MANIFEST = 'manifest'
+
+
+def item_name(item):
+    # Older harbor returns plain names, newer ones return objects
+    if isinstance(item, dict):
+        return item.get('name') or item.get('repository_name')
+    return item
+
+
+def name_matches(name, pattern):
+    if pattern is None:
+        return True
+    if isinstance(pattern, (list, tuple)):
+        return any(fnmatch.fnmatchcase(name, p) for p in pattern)
+    return fnmatch.fnmatchcase(name, pattern)
+
+
+def crawl(client, project_pattern=None, repository_pattern=None,
+          manifests=True, workers=8, max_pending=None):
+    """Yield a CrawlRecord for every tag in the registry.
+
+    Repository, tag and manifest requests are fanned out over `workers`
+    threads. Work is expanded depth-first and at most `max_pending` requests
+    are queued at a time, so memory stays bounded however large the registry
+    is. Patterns are shell-style globs (or lists of them) matched against the
+    project name and the full repository name, e.g. "library/*". Projects
+    and repositories are listed page by page. A request which fails does
+    not stop the crawl, it is yielded as a record with error set.
+    """
+    if max_pending is None:
+        max_pending = workers * 4
+
+    # A stack keeps the crawl depth-first, finishing repositories before
+    # starting new projects
+    tasks = []
+    projects = [to_json(project) for project in client.iter_projects()]
+    for project in reversed(projects):
+        if name_matches(project['name'], project_pattern):
+            tasks.append((_REPOSITORIES, project, None, None))
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    pending = {}
+    try:
+        while tasks or pending:
+            while tasks and len(pending) < max_pending:
+                task = tasks.pop()
+                pending[executor.submit(_fetch, client, task)] = task
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                kind, project, repository, tag = pending.pop(future)
+                try:
+                    result = future.result()
+                    error = None
+                except Exception as e:
+                    result = None
+                    error = '%s: %s' % (type(e).__name__, e)
+                if result is None:
+                    error = error or "Fail to get %s" % kind
+                    logger.warning("Fail to crawl %s of %s: %s", kind,
+                                   tag or repository or project['name'],
+                                   error)
+                    yield CrawlRecord(project, repository, tag, None, error)
+                    continue
+
+                if kind == _REPOSITORIES:
+                    for repo in reversed(result):
+                        name = item_name(repo)
+                        if name_matches(name, repository_pattern):
+                            tasks.append((_TAGS, project, name, None))
+                elif kind == _TAGS:
+                    for tag_item in reversed(result):
+                        tag_name = item_name(tag_item)
+                        if manifests:
+                            tasks.append((_MANIFEST, project, repository,
+                                          tag_name))
+                        else:
+                            yield CrawlRecord(project, repository, tag_name,
+                                              None)
+                else:
+                    yield CrawlRecord(project, repository, tag, result)
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+
+def _fetch(client, task):
+    # Records carry JSON, also for clients returning models
+    kind, project, repository, tag = task
+    if kind == _REPOSITORIES:
+        # The pages stop at a failed request, which is the last response
+        if hasattr(client, 'last_response'):
+            client.last_response = None
+        repositories = [to_json(repo) for repo in
+                        client.iter_repositories(project['project_id'])]
+        response = getattr(client, 'last_response', None)
+        if response is not None and response.status_code != 200:
+            return None
+        return repositories
+    elif kind == _TAGS:
+        return to_json(client.get_repository_tags(repository))
+    return to_json(client.get_repository_manifests(repository, tag))
@@ -0,0 +1,10 @@
+#!/usr/bin/env python
+
+
+class HarborError(Exception):
+    pass
+
+
+# Raised instead of sending a request while the circuit breaker is open
+class CircuitOpenError(HarborError):
+    pass
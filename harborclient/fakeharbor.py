@@ -0,0 +1,483 @@
+#!/usr/bin/env python
+
+import calendar
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import urlparse, parse_qs
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class FakeHarbor(object):
+    """In-process fake of the harbor API used by HarborClient.
+
+    It serves the same endpoints as a real harbor from in-memory data so the
+    client can be tested without a registry running at 127.0.0.1.
+    projects, repositories and tags size the generated data set. Every API
+    request waits latency seconds, or a uniform draw from a (low, high)
+    range, and fails with error_status at error_rate. seed makes both
+    repeatable. paging=False serves every listing whole without
+    X-Total-Count, like a server ignoring page and page_size.
+    """
+
+    def __init__(self, projects=2, repositories=2, tags=3,
+                 user="admin", password="Harbor12345", latency=0,
+                 error_rate=0, error_status=503, seed=None, paging=True):
+        self.user = user
+        self.password = password
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.paging = paging
+        self.random = random.Random(seed)
+        self.error_count = 0
+        self.lock = threading.Lock()
+        self.sessions = set()
+        self.login_count = 0
+        self.connection_count = 0
+        self.request_count = 0
+        self.not_modified_count = 0
+        self.path_counts = {}
+        self.faults = {}
+
+        self.projects = []
+        self.repositories = {}
+        self.users = [{'user_id': 1, 'username': user, 'email': '',
+                       'realname': user, 'comment': '', 'has_admin_role': 1}]
+        self.logs = []
+        self._next_project_id = 1
+        self._next_user_id = 2
+        self._next_log_id = 1
+        self._populate(projects, repositories, tags)
+
+        self.server = None
+        self.thread = None
+
+    def _populate(self, projects, repositories, tags):
+        for i in range(projects):
+            project_name = "project%d" % i
+            project_id = self.add_project(project_name, is_public=(i == 0))
+            for j in range(repositories):
+                repo_name = "%s/repo%d" % (project_name, j)
+                for k in range(tags):
+                    self.add_tag(project_id, repo_name, "v%d" % k)
+
+    @property
+    def host(self):
+        return "127.0.0.1:%d" % self.server.server_address[1]
+
+    def start(self):
+        handler = type('FakeHarborHandler', (_Handler, ), {'harbor': self})
+        self.server = _ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       kwargs={'poll_interval': 0.05})
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    # Data helpers
+
+    def add_project(self, project_name, is_public=False):
+        project_id = self._next_project_id
+        self._next_project_id += 1
+        self.projects.append({'project_id': project_id,
+                              'name': project_name,
+                              'public': 1 if is_public else 0,
+                              'creation_time': _now(),
+                              'repo_count': 0})
+        return project_id
+
+    def add_tag(self, project_id, repo_name, tag, layers=None, digest=None):
+        repo = self.repositories.setdefault(
+            repo_name, {'project_id': project_id, 'tags': {}, 'pulls': 0})
+        if layers is None:
+            layers = [{'digest': _digest(repo_name, tag, i), 'size': 1024 *
+                       (i + 1)} for i in range(2)]
+        created = _now(len(self.logs))
+        repo['tags'][tag] = {
+            'manifest': {'schemaVersion': 2,
+                         'mediaType':
+                         'application/vnd.docker.distribution.manifest.v2+json',
+                         'config': {'digest': _digest(repo_name, tag, 'c'),
+                                    'size': 512},
+                         'layers': layers},
+            'config': json.dumps({'created': created}),
+            'digest': digest or _digest(repo_name, tag, 'm'),
+        }
+        self.add_log(project_id, repo_name, tag, 'push')
+
+    def add_log(self, project_id, repo_name, tag, operation):
+        self.logs.append({'log_id': self._next_log_id,
+                          'user_id': 1,
+                          'project_id': project_id,
+                          'repo_name': repo_name,
+                          'repo_tag': tag,
+                          'operation': operation,
+                          'op_time': _now(self._next_log_id),
+                          'username': self.user})
+        self._next_log_id += 1
+
+    def expire_sessions(self):
+        # Forget every session, as when beegosessionID expires
+        with self.lock:
+            self.sessions.clear()
+
+    def inject(self, path, status=503, count=1, delay=0):
+        # Answer the next count requests to path with status after sleeping
+        # delay seconds, status None only delays them
+        with self.lock:
+            self.faults.setdefault(path, []).extend([(status, delay)] * count)
+
+    def _draw_fault(self):
+        # Configured latency and random error of one request, called with
+        # the lock held so a seeded run draws the same sequence
+        delay = self.latency
+        if isinstance(delay, tuple):
+            delay = self.random.uniform(*delay)
+        status = None
+        if self.error_rate and self.random.random() < self.error_rate:
+            status = self.error_status
+            self.error_count += 1
+        if not delay and status is None:
+            return None
+        return status, delay
+
+    def find_project(self, project_id=None, project_name=None):
+        for project in self.projects:
+            if project_id is not None and project['project_id'] == project_id:
+                return project
+            if project_name is not None and project['name'] == project_name:
+                return project
+        return None
+
+
+def _now(offset=0):
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ',
+                         time.gmtime(1500000000 + offset))
+
+
+def _timestamp(op_time):
+    return calendar.timegm(time.strptime(op_time, '%Y-%m-%dT%H:%M:%SZ'))
+
+
+def _digest(*parts):
+    return 'sha256:' + hashlib.sha256(
+        '/'.join(str(p) for p in parts).encode('utf-8')).hexdigest()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately, with Nagle's algorithm the
+    # body would wait for the client's delayed ACK of the headers
+    disable_nagle_algorithm = True
+    harbor = None
+
+    routes = [
+        ('POST', r'/login$', 'login'),
+        ('GET', r'/logout$', 'logout'),
+        ('GET', r'/api/search$', 'search'),
+        ('GET', r'/api/projects$', 'get_projects'),
+        ('HEAD', r'/api/projects$', 'check_project_exist'),
+        ('POST', r'/api/projects$', 'create_project'),
+        ('PUT', r'/api/projects/(\d+)/publicity$', 'set_project_publicity'),
+        ('GET', r'/api/statistics$', 'get_statistics'),
+        ('GET', r'/api/users$', 'get_users'),
+        ('POST', r'/api/users$', 'create_user'),
+        ('PUT', r'/api/users/(\d+)$', 'update_user_profile'),
+        ('DELETE', r'/api/users/(\d+)$', 'delete_user'),
+        ('PUT', r'/api/users/(\d+)/password$', 'change_password'),
+        ('PUT', r'/api/users/(\d+)/sysadmin$', 'promote_as_admin'),
+        ('GET', r'/api/repositories$', 'get_repositories'),
+        ('DELETE', r'/api/repositories$', 'delete_repository'),
+        ('GET', r'/api/repositories/tags$', 'get_repository_tags'),
+        ('GET', r'/api/repositories/manifests$', 'get_repository_manifests'),
+        ('GET', r'/api/repositories/top$', 'get_top_accessed_repositories'),
+        ('GET', r'/api/logs$', 'get_logs'),
+    ]
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        with self.harbor.lock:
+            self.harbor.connection_count += 1
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_HEAD(self):
+        self._dispatch('HEAD')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_PUT(self):
+        self._dispatch('PUT')
+
+    def do_DELETE(self):
+        self._dispatch('DELETE')
+
+    def _dispatch(self, method):
+        harbor = self.harbor
+        url = urlparse(self.path)
+        self.query = dict((k, v[-1]) for k, v in parse_qs(url.query).items())
+        length = int(self.headers.get('Content-Length') or 0)
+        self.body = self.rfile.read(length) if length else b''
+
+        with harbor.lock:
+            harbor.request_count += 1
+            harbor.path_counts[url.path] = harbor.path_counts.get(url.path,
+                                                                  0) + 1
+            faults = harbor.faults.get(url.path)
+            fault = faults.pop(0) if faults else None
+            if fault is None and url.path.startswith('/api/'):
+                fault = harbor._draw_fault()
+        if fault is not None:
+            status, delay = fault
+            time.sleep(delay)
+            if status is not None:
+                return self._send(status)
+
+        for route_method, pattern, name in self.routes:
+            match = re.match(pattern, url.path)
+            if route_method == method and match:
+                if name not in ('login', 'logout') and not self._authorized():
+                    return self._send(401)
+                with harbor.lock:
+                    return getattr(self, name)(*match.groups())
+        self._send(404)
+
+    def _authorized(self):
+        cookie = self.headers.get('Cookie') or ''
+        for part in cookie.split(';'):
+            key, _, value = part.strip().partition('=')
+            if key == 'beegosessionID' and value in self.harbor.sessions:
+                return True
+        return False
+
+    def _send(self, status, result=None, headers=None):
+        body = b'' if result is None else json.dumps(result).encode('utf-8')
+        headers = dict(headers or {})
+        if self.command == 'GET' and status == 200:
+            etag = '"%s"' % hashlib.sha1(body).hexdigest()
+            headers['ETag'] = etag
+            if self.headers.get('If-None-Match') == etag:
+                self.harbor.not_modified_count += 1
+                status, body = 304, b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        if self.command != 'HEAD' and status != 304:
+            self.wfile.write(body)
+
+    def _send_page(self, items):
+        # Honour page and page_size like harbor, reporting the full size
+        if not self.harbor.paging:
+            self._send(200, items)
+            return
+        page_size = self.query.get('page_size')
+        headers = {'X-Total-Count': str(len(items))}
+        if page_size:
+            start = (int(self.query.get('page', 1)) - 1) * int(page_size)
+            items = items[start:start + int(page_size)]
+        self._send(200, items, headers)
+
+    def _json_body(self):
+        return json.loads(self.body.decode('utf-8') or '{}')
+
+    # Endpoints
+
+    def login(self):
+        form = dict((k, v[-1])
+                    for k, v in parse_qs(self.body.decode('utf-8')).items())
+        if (form.get('principal') != self.harbor.user or
+                form.get('password') != self.harbor.password):
+            return self._send(401)
+        session_id = uuid.uuid4().hex
+        self.harbor.sessions.add(session_id)
+        self.harbor.login_count += 1
+        self._send(200, headers={
+            'Set-Cookie': 'beegosessionID=%s; Path=/' % session_id})
+
+    def logout(self):
+        self._send(200)
+
+    def search(self):
+        q = self.query.get('q', '')
+        projects = [p for p in self.harbor.projects if q in p['name']]
+        repositories = []
+        for name, repo in sorted(self.harbor.repositories.items()):
+            if q in name:
+                project = self.harbor.find_project(repo['project_id'])
+                repositories.append({'repository_name': name,
+                                     'project_name': project['name'],
+                                     'project_id': project['project_id'],
+                                     'project_public': project['public']})
+        self._send(200, {'project': projects, 'repository': repositories})
+
+    def get_projects(self):
+        name = self.query.get('project_name')
+        public = self.query.get('is_public')
+        projects = [p for p in self.harbor.projects
+                    if (name is None or name in p['name']) and
+                    (public is None or p['public'] == int(public))]
+        self._send_page(projects)
+
+    def check_project_exist(self):
+        project = self.harbor.find_project(
+            project_name=self.query.get('project_name'))
+        self._send(200 if project else 404)
+
+    def create_project(self):
+        body = self._json_body()
+        if self.harbor.find_project(project_name=body['project_name']):
+            return self._send(409)
+        project_id = self.harbor.add_project(body['project_name'],
+                                             body.get('public'))
+        self.harbor.add_log(project_id, body['project_name'] + '/', 'N/A',
+                            'create')
+        self._send(201)
+
+    def set_project_publicity(self, project_id):
+        project = self.harbor.find_project(int(project_id))
+        if project is None:
+            return self._send(404)
+        project['public'] = 1 if self._json_body().get('public') else 0
+        self._send(200)
+
+    def get_statistics(self):
+        total_repos = len(self.harbor.repositories)
+        self._send(200, {'total_project_count': len(self.harbor.projects),
+                         'public_project_count': len(
+                             [p for p in self.harbor.projects if p['public']]),
+                         'total_repo_count': total_repos})
+
+    def _find_user(self, user_id):
+        for user in self.harbor.users:
+            if user['user_id'] == int(user_id):
+                return user
+        return None
+
+    def get_users(self):
+        name = self.query.get('username')
+        self._send_page([u for u in self.harbor.users
+                         if name is None or name in u['username']])
+
+    def create_user(self):
+        body = self._json_body()
+        if any(u['username'] == body['username'] for u in self.harbor.users):
+            return self._send(409)
+        user = dict(body, user_id=self.harbor._next_user_id, has_admin_role=0)
+        user.pop('password', None)
+        self.harbor._next_user_id += 1
+        self.harbor.users.append(user)
+        self._send(201)
+
+    def update_user_profile(self, user_id):
+        user = self._find_user(user_id)
+        if user is None:
+            return self._send(404)
+        user.update(self._json_body())
+        self._send(200)
+
+    def delete_user(self, user_id):
+        user = self._find_user(user_id)
+        if user is None:
+            return self._send(404)
+        self.harbor.users.remove(user)
+        self._send(200)
+
+    def change_password(self, user_id):
+        self._send(200 if self._find_user(user_id) else 404)
+
+    def promote_as_admin(self, user_id):
+        user = self._find_user(user_id)
+        if user is None:
+            return self._send(404)
+        user['has_admin_role'] = 1
+        self._send(200)
+
+    def get_repositories(self):
+        project_id = int(self.query.get('project_id', 0))
+        q = self.query.get('q', '')
+        self._send_page([name
+                         for name, repo in sorted(
+                             self.harbor.repositories.items())
+                         if repo['project_id'] == project_id and q in name])
+
+    def delete_repository(self):
+        repo_name = self.query.get('repo_name')
+        repo = self.harbor.repositories.get(repo_name)
+        if repo is None:
+            return self._send(404)
+        tag = self.query.get('tag')
+        if tag:
+            if tag not in repo['tags']:
+                return self._send(404)
+            del repo['tags'][tag]
+            tags = [tag]
+        else:
+            tags = list(repo['tags'])
+            repo['tags'].clear()
+        if not repo['tags']:
+            del self.harbor.repositories[repo_name]
+        for tag in tags:
+            self.harbor.add_log(repo['project_id'], repo_name, tag, 'delete')
+        self._send(200)
+
+    def get_repository_tags(self):
+        repo = self.harbor.repositories.get(self.query.get('repo_name'))
+        if repo is None:
+            return self._send(404)
+        self._send(200, sorted(repo['tags']))
+
+    def get_repository_manifests(self):
+        repo = self.harbor.repositories.get(self.query.get('repo_name'))
+        if repo is None or self.query.get('tag') not in repo['tags']:
+            return self._send(404)
+        repo['pulls'] += 1
+        self._send(200, repo['tags'][self.query.get('tag')])
+
+    def get_top_accessed_repositories(self):
+        count = int(self.query.get('count', 10))
+        top = sorted(self.harbor.repositories.items(),
+                     key=lambda item: -item[1]['pulls'])[:count]
+        self._send(200, [{'name': name, 'count': repo['pulls']}
+                         for name, repo in top])
+
+    def get_logs(self):
+        logs = self.harbor.logs
+        start_time = self.query.get('start_time')
+        end_time = self.query.get('end_time')
+        if start_time or end_time:
+            logs = [log for log in logs
+                    if int(start_time or 0) <= _timestamp(log['op_time']) <=
+                    int(end_time or 2 ** 62)]
+        if self.query.get('lines'):
+            logs = logs[:int(self.query.get('lines'))]
+        self._send_page(logs)
@@ -1,88 +1,538 @@
 #!/usr/bin/env python
 
+import functools
 import json
 import logging
-import requests
+import threading
+import time
 
-logging.basicConfig(level=logging.INFO)
+from harborclient.cache import INVALIDATIONS, MISSING, ParsedResponse
+from harborclient.metrics import RequestEvent
+from harborclient.models import (TABLE, LogEntry, Manifest, Project,
+                                 Repository, Table, Tag, User)
+from harborclient.resilience import LatencyTracker, RetryPolicy, endpoint_of
+from harborclient.singleflight import SingleFlight
+from harborclient.streaming import iter_response_items
+
+logger = logging.getLogger(__name__)
+
+# Default number of items requested per page by the iter_* methods
+PAGE_SIZE = 100
+
+# Default connect and read timeouts in seconds
+DEFAULT_TIMEOUT = (5, 60)
+
+# Default retries of idempotent calls
+DEFAULT_RETRY = RetryPolicy()
+
+# Responses telling the client to slow down, overload and server errors
+OVERLOAD_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# Items and characters of a response payload written to the debug log
+LOG_PAYLOAD_ITEMS = 10
+LOG_PAYLOAD_CHARS = 1000
+
+
+class _Payload(object):
+    # Formatted only when the log record is emitted, so a disabled debug
+    # level never walks a large response
+    __slots__ = ('value', )
+
+    def __init__(self, value):
+        self.value = value
+
+    def __str__(self):
+        value = self.value
+        if isinstance(value, list) and len(value) > LOG_PAYLOAD_ITEMS:
+            text = '%s, ... %d more]' % (str(value[:LOG_PAYLOAD_ITEMS])[:-1],
+                                        len(value) - LOG_PAYLOAD_ITEMS)
+        else:
+            text = str(value)
+        if len(text) > LOG_PAYLOAD_CHARS:
+            text = text[:LOG_PAYLOAD_CHARS] + '...'
+        return text
+
+
+# Query parameters without the unset ones, booleans sent as 0 or 1
+def _params(**kwargs):
+    params = {}
+    for key, value in kwargs.items():
+        if value is not None:
+            params[key] = int(value) if isinstance(value, bool) else value
+    return params
+
+
+# Serve a read endpoint from the client cache when one is configured. The
+# arguments are keyed with the protocol and user, as users see different
+# projects and caches may be shared by clients of several users.
+def _cached(func):
+    endpoint = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        if self.cache is None:
+            return func(self, *args, **kwargs)
+        key = (self.host, endpoint, (self.protocol, self.user) + args +
+               tuple(sorted(kwargs.items())))
+        result = self.cache.get(key)
+        for hook in self.hooks:
+            hook.on_cache(endpoint, result is not MISSING)
+        if result is MISSING:
+            result = func(self, *args, **kwargs)
+            if result is not None:
+                self.cache.set(key, result)
+        return result
+
+    return wrapper
+
+
+# Drop the cached reads a write endpoint makes stale
+def _invalidates(func):
+    endpoints = INVALIDATIONS[func.__name__]
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return func(self, *args, **kwargs)
+        finally:
+            if self.cache is not None:
+                self.cache.invalidate(self.host, endpoints)
+
+    return wrapper
+
+
+# Return the result as models of harborclient.models when the client has
+# models enabled. context names the arguments filling in the model's
+# CONTEXT. The cache keeps the JSON, so models are built per call.
+def _typed(model, *context):
+    def decorator(func):
+        # Positions of the context arguments after self, read from the
+        # function under the other decorators
+        code = func
+        while hasattr(code, '__wrapped__'):
+            code = code.__wrapped__
+        code = code.__code__
+        names = code.co_varnames[1:code.co_argcount]
+        positions = [(name, names.index(name)) for name in context]
+
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            result = func(self, *args, **kwargs)
+            if not self.models or result is None:
+                return result
+            result = model.wrap(result, *[
+                kwargs[name] if name in kwargs else
+                args[position] if position < len(args) else None
+                for name, position in positions])
+            if self.models == TABLE and isinstance(result, list):
+                return Table(model, result)
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+@functools.lru_cache(maxsize=None)
+def _cookie_jar_class():
+    # requests is imported with the first session, not with this module,
+    # so the jar subclassing one of its classes is defined then too
+    from requests.cookies import RequestsCookieJar
+
+    class ThreadSafeCookieJar(RequestsCookieJar):
+        # Cookie jar that can be read while another thread logs in.
+        # Preparing a request iterates the session jar without its lock,
+        # which fails when a login response updates it at the same time.
+        def __iter__(self):
+            with self._cookies_lock:
+                return iter(list(RequestsCookieJar.__iter__(self)))
+
+    return ThreadSafeCookieJar
+
+
+def __getattr__(name):
+    if name == 'ThreadSafeCookieJar':
+        return _cookie_jar_class()
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
 
 
 class HarborClient(object):
-    def __init__(self, host, user, password, protocol="http"):
+    def __init__(self, host, user, password, protocol="http",
+                 pool_connections=10, pool_maxsize=10, pool_block=False,
+                 session=None, cache=None, validators=None,
+                 timeout=DEFAULT_TIMEOUT, timeouts=None, retry=DEFAULT_RETRY,
+                 retries=None, circuit_breaker=None, adaptive_timeout=False,
+                 threads=None, coalesce=False, rate_limiter=None,
+                 concurrency_limit=None, hooks=(), models=False,
+                 session_id=None, adapter=None):
         self.host = host
         self.user = user
         self.password = password
         self.protocol = protocol
+        # Optional ResponseCache shared by the read endpoints
+        self.cache = cache
+        # Optional ValidatorCache for conditional tag and manifest requests
+        self.validators = validators
+
+        # Connect and read timeouts, overridden per endpoint by timeouts,
+        # e.g. {'/api/logs': (5, 300)}. With adaptive_timeout the read
+        # timeout follows the latency observed per endpoint, up to those.
+        self.timeout = timeout
+        self.timeouts = timeouts or {}
+        self.latency = LatencyTracker() if adaptive_timeout else None
+        # RetryPolicy of idempotent calls, overridden per endpoint by
+        # retries, None disables retries
+        self.retry = retry
+        self.retries = retries or {}
+        # Optional CircuitBreaker failing fast while the host is down
+        self.circuit_breaker = circuit_breaker
+        # With coalesce identical GET and HEAD requests in flight at the same
+        # time share one network call
+        self.coalescer = SingleFlight() if coalesce else None
+        # Optional RateLimiter, which can be shared by clients, and
+        # AdaptiveConcurrency limit applied to every request sent
+        self.rate_limiter = rate_limiter
+        self.concurrency_limit = concurrency_limit
+        # Instrumentation hooks, see harborclient.metrics
+        self.hooks = list(hooks)
+        # With models the read endpoints return harborclient.models objects
+        # instead of JSON dicts, their raw attribute holds the JSON. With
+        # models='table' the listings come as a compact Table of them.
+        self.models = models
+
+        # All endpoints share one keep-alive session. pool_connections is the
+        # number of per-host pools to cache, pool_maxsize the number of
+        # connections kept per host and pool_block makes callers wait for a
+        # free connection instead of opening extra ones past that limit.
+        # threads sizes the pool for that many threads sharing the client.
+        # Clients share connections through one adapter, each keeping its
+        # own session and cookies. A shared session shares the login too,
+        # so it only fits clients of the same host and user.
+        if threads is not None:
+            pool_maxsize, pool_block = threads, True
+        if session is None:
+            session = self.create_session(pool_connections, pool_maxsize,
+                                          pool_block, adapter)
+        self.session = session
+        self._shares_adapter = adapter is not None
+        # Last response seen by each thread, see last_response
+        self._local = threading.local()
+
+        # Login happens on the first call and again whenever the session
+        # expires. The generation counts logins so threads hitting the same
+        # expired session log in only once. A session_id logged in
+        # elsewhere, e.g. by an earlier process, skips the first login and
+        # is left logged in by close().
+        self.session_id = None
+        self._owns_session = False
+        self._login_lock = threading.Lock()
+        self._login_generation = 0
+        if session_id is not None:
+            # Stored under the domain cookielib gives the cookie of a login
+            # response, <host>.local for a dotless host such as localhost,
+            # so it is sent and a later login replaces it
+            domain = host.split(':')[0]
+            if '.' not in domain:
+                domain += '.local'
+            self.session_id = session_id
+            self.session.cookies.set('beegosessionID', session_id,
+                                     domain=domain, path='/')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    # Logout if logged in by this client and release the pooled connections,
+    # a shared adapter is left open for the other clients
+    def close(self):
+        if self.session_id is not None and self._owns_session:
+            self.logout()
+        if not self._shares_adapter:
+            self.session.close()
+
+    @staticmethod
+    def create_adapter(pool_connections=10, pool_maxsize=10, pool_block=False):
+        from requests.adapters import HTTPAdapter
 
-        self.session_id = self.login()
+        return HTTPAdapter(pool_connections=pool_connections,
+                           pool_maxsize=pool_maxsize, pool_block=pool_block)
 
-    def __del__(self):
-        self.logout()
+    @staticmethod
+    def create_session(pool_connections=10, pool_maxsize=10, pool_block=False,
+                       adapter=None):
+        import requests
+
+        session = requests.Session()
+        session.cookies = _cookie_jar_class()()
+        if adapter is None:
+            adapter = HarborClient.create_adapter(pool_connections,
+                                                  pool_maxsize, pool_block)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    # Response of the last API call made by the current thread. Set it to
+    # None before a call to tell whether the call sent a request at all, a
+    # cache hit or an open circuit does not.
+    @property
+    def last_response(self):
+        return getattr(self._local, 'response', None)
+
+    @last_response.setter
+    def last_response(self, response):
+        self._local.response = response
+
+    def _request(self, method, path, conditional=False, authenticate=True,
+                 **kwargs):
+        if (self.coalescer is not None and method in ('GET', 'HEAD') and
+                not kwargs.get('stream')):
+            key = (method, path, conditional,
+                   tuple(sorted((kwargs.get('params') or {}).items())))
+            response = self.coalescer.do(
+                key, functools.partial(self._authenticated, method, path,
+                                       conditional, authenticate, kwargs))
+        else:
+            response = self._authenticated(method, path, conditional,
+                                           authenticate, kwargs)
+        self._local.response = response
+        return response
+
+    def _authenticated(self, method, path, conditional, authenticate,
+                       kwargs):
+        if not authenticate:
+            return self._perform(method, path, conditional, kwargs)
+
+        generation = self._ensure_login()
+        response = self._perform(method, path, conditional, kwargs)
+        # The session expired, send the request again with a new one. A
+        # second round covers the new session expiring in the meantime.
+        for _ in range(2):
+            if response.status_code != 401:
+                break
+            generation = self._relogin(generation)
+            if generation is None:
+                break
+            response.close()
+            response = self._perform(method, path, conditional, kwargs)
+        return response
+
+    def _ensure_login(self):
+        if self.session_id is None:
+            with self._login_lock:
+                if self.session_id is None:
+                    self.login()
+        return self._login_generation
+
+    # Log in again unless another thread already did since the request was
+    # sent, returns the new login generation or None if login failed
+    def _relogin(self, generation):
+        with self._login_lock:
+            if self._login_generation == generation:
+                self.login()
+            if self.session_id is None:
+                return None
+            return self._login_generation
+
+    def _perform(self, method, path, conditional, kwargs):
+        import requests
+
+        kwargs = dict(kwargs)
+        endpoint = endpoint_of(path)
+        retry = self.retries.get(endpoint, self.retry)
+        if 'timeout' not in kwargs:
+            kwargs['timeout'] = self._timeout(endpoint)
+
+        attempt = 0
+        while True:
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.before_request()
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(self.host, method)
+            if self.concurrency_limit is not None:
+                self.concurrency_limit.acquire()
+            if self.hooks:
+                spans = [hook.start_span(method, endpoint, attempt)
+                         for hook in self.hooks]
+            response = error = failure = None
+            start = time.time()
+            try:
+                response = self._send(method, path, conditional, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            except BaseException as e:
+                # Any other error still counts as a failure, or a trial
+                # request of the circuit breaker would never be settled
+                failure = e
+                if (self.circuit_breaker is not None and
+                        isinstance(e, Exception)):
+                    self.circuit_breaker.record_failure()
+                raise
+            finally:
+                latency = time.time() - start
+                if self.concurrency_limit is not None:
+                    self.concurrency_limit.release(
+                        start, latency, response is None or
+                        response.status_code in OVERLOAD_STATUS_CODES)
+                if self.hooks:
+                    self._emit(method, endpoint, response, error or failure,
+                               latency, attempt, spans)
+
+            if error is not None:
+                self._record(endpoint, None, latency, kwargs['timeout'],
+                             error)
+                if retry is None or not retry.should_retry(method, attempt):
+                    raise error
+            else:
+                self._record(endpoint, response.status_code, latency,
+                             kwargs['timeout'])
+                if retry is None or not retry.should_retry(
+                        method, attempt, response.status_code):
+                    return response
+                response.close()
+
+            backoff = retry.backoff(attempt, response)
+            for hook in self.hooks:
+                hook.on_retry(method, endpoint, attempt + 1, backoff)
+            logger.debug("Retry %s %s in %.2fs, attempt: %s", method, endpoint,
+                         backoff, attempt + 1)
+            time.sleep(backoff)
+            attempt += 1
+
+    def _emit(self, method, endpoint, response, error, latency, attempt,
+              spans):
+        status_code = bytes_sent = bytes_received = 0
+        not_modified = False
+        if response is not None:
+            status_code = response.status_code
+            not_modified = getattr(response, 'not_modified', False)
+            body = response.request.body if response.request else None
+            bytes_sent = len(body) if body else 0
+            bytes_received = int(response.headers.get('Content-Length') or 0)
+        event = RequestEvent(self.host, method, endpoint,
+                             status_code if response is not None else None,
+                             latency, bytes_sent, bytes_received, attempt,
+                             not_modified, error)
+        for hook, span in zip(self.hooks, spans):
+            hook.on_request(event, span)
+
+    def _timeout(self, endpoint):
+        timeout = self.timeouts.get(endpoint, self.timeout)
+        if self.latency is None or timeout is None:
+            return timeout
+        if isinstance(timeout, tuple):
+            return (timeout[0], self.latency.timeout(endpoint, timeout[1]))
+        return (timeout, self.latency.timeout(endpoint, timeout))
+
+    def _record(self, endpoint, status_code, latency, timeout, error=None):
+        failed = error is not None or status_code >= 500
+        if self.circuit_breaker is not None:
+            if failed:
+                self.circuit_breaker.record_failure()
+            else:
+                self.circuit_breaker.record_success()
+        if self.latency is not None:
+            import requests
+
+            read = timeout[1] if isinstance(timeout, tuple) else timeout
+            if isinstance(error, requests.Timeout) and read is not None:
+                # Back off like TCP does after a retransmission timeout
+                self.latency.observe(endpoint, 2 * read)
+            elif error is None:
+                self.latency.observe(endpoint, latency)
+
+    def _send(self, method, path, conditional=False, **kwargs):
+        if not conditional or self.validators is None:
+            return self.session.request(method, path, **kwargs)
+
+        # Send the remembered validators so an unchanged body comes back as
+        # 304 Not Modified and is served from the parsed copy
+        headers = self.validators.headers(path)
+        headers.update(kwargs.pop('headers', None) or {})
+        response = self.session.request(method, path, headers=headers,
+                                        **kwargs)
+        if response.status_code == 304:
+            data = self.validators.not_modified(path)
+            if data is not MISSING:
+                return ParsedResponse(response, data, not_modified=True)
+        elif response.status_code == 200:
+            data = response.json()
+            self.validators.update(path, response, data)
+            return ParsedResponse(response, data)
+        return response
 
     def login(self):
-        login_data = requests.post('%s://%s/login' %
+        login_data = self._request('POST', '%s://%s/login' %
                                    (self.protocol, self.host),
+                                   authenticate=False,
                                    data={'principal': self.user,
                                          'password': self.password})
         if login_data.status_code == 200:
             session_id = login_data.cookies.get('beegosessionID')
+            self.session_id = session_id
+            self._owns_session = True
+            self._login_generation += 1
 
-            logging.debug("Successfully login, session id: {}".format(
-                session_id))
+            logger.debug("Successfully login, session id: %s", session_id)
             return session_id
         else:
-            logging.error("Fail to login, please try again")
+            self.session_id = None
+            logger.error("Fail to login, please try again")
             return None
 
     def logout(self):
-        requests.get('%s://%s/logout' % (self.protocol, self.host),
-                     cookies={'beegosessionID': self.session_id})
-        logging.debug("Successfully logout")
+        self._request('GET', '%s://%s/logout' % (self.protocol, self.host),
+                      authenticate=False)
+        self.session_id = None
+        logger.debug("Successfully logout")
 
     # Get project id
+    @_cached
     def get_project_id_from_name(self, project_name):
-        registry_data = requests.get(
-            '%s://%s/api/projects?project_name=%s' %
-            (self.protocol, self.host, project_name),
-            cookies={'beegosessionID': self.session_id})
+        registry_data = self._request(
+            'GET', '%s://%s/api/projects?project_name=%s' %
+            (self.protocol, self.host, project_name))
         if registry_data.status_code == 200 and registry_data.json():
             project_id = registry_data.json()[0]['project_id']
-            logging.debug(
-                "Successfully get project id: {}, project name: {}".format(
-                    project_id, project_name))
+            logger.debug("Successfully get project id: %s, project name: %s",
+                         project_id, project_name)
             return project_id
         else:
-            logging.error("Fail to get project id from project name",
-                          project_name)
+            logger.error("Fail to get project id from project name: %s",
+                         project_name)
             return None
 
     # GET /search
+    @_cached
     def search(self, query_string):
         result = None
         path = '%s://%s/api/search?q=%s' % (self.protocol, self.host,
                                             query_string)
-        response = requests.get(path,
-                                cookies={'beegosessionID': self.session_id})
+        response = self._request('GET', path)
         if response.status_code == 200:
             result = response.json()
-            logging.debug("Successfully get search result: {}".format(result))
+            logger.debug("Successfully get search result: %s",
+                         _Payload(result))
         else:
-            logging.error("Fail to get search result")
+            logger.error("Fail to get search result")
         return result
 
     # GET /projects
+    @_typed(Project)
+    @_cached
     def get_projects(self, project_name=None, is_public=None):
-        # TODO: support parameter
         result = None
         path = '%s://%s/api/projects' % (self.protocol, self.host)
-        response = requests.get(path,
-                                cookies={'beegosessionID': self.session_id})
+        response = self._request('GET', path,
+                                 params=_params(project_name=project_name,
+                                                is_public=is_public))
         if response.status_code == 200:
             result = response.json()
-            logging.debug("Successfully get projects result: {}".format(
-                result))
+            logger.debug("Successfully get projects result: %s",
+                         _Payload(result))
         else:
-            logging.error("Fail to get projects result")
+            logger.error("Fail to get projects result")
         return result
 
     # HEAD /projects
@@ -90,89 +540,85 @@ class HarborClient(object):
         result = False
         path = '%s://%s/api/projects?project_name=%s' % (
             self.protocol, self.host, project_name)
-        response = requests.head(path,
-                                 cookies={'beegosessionID': self.session_id})
+        response = self._request('HEAD', path)
         if response.status_code == 200:
             result = True
-            logging.debug(
-                "Successfully check project exist, result: {}".format(result))
+            logger.debug("Successfully check project exist, result: %s",
+                         result)
         elif response.status_code == 404:
             result = False
-            logging.debug(
-                "Successfully check project exist, result: {}".format(result))
+            logger.debug("Successfully check project exist, result: %s",
+                         result)
         else:
-            logging.error("Fail to check project exist")
+            logger.error("Fail to check project exist")
         return result
 
     # POST /projects
+    @_invalidates
     def create_project(self, project_name, is_public=False):
         result = False
         path = '%s://%s/api/projects' % (self.protocol, self.host)
         request_body = json.dumps({'project_name': project_name,
                                    'public': is_public})
-        response = requests.post(path,
-                                 cookies={'beegosessionID': self.session_id},
-                                 data=request_body)
-        if response.status_code == 201 or response.status_code == 500:
-            # TODO: the response return 500 sometimes
+        response = self._request('POST', path, data=request_body)
+        if response.status_code == 201:
             result = True
-            logging.debug(
-                "Successfully create project with project name: {}".format(
-                    project_name))
+            logger.debug("Successfully create project with project name: %s",
+                         project_name)
         else:
-            logging.error(
-                "Fail to create project with project name: {}, response code: {}".format(
-                    project_name, response.status_code))
+            logger.error(
+                "Fail to create project with project name: %s, response code: %s",
+                project_name, response.status_code)
         return result
 
     # PUT /projects/{project_id}/publicity
+    @_invalidates
     def set_project_publicity(self, project_id, is_public):
         result = False
         path = '%s://%s/api/projects/%s/publicity?project_id=%s' % (
             self.protocol, self.host, project_id, project_id)
         request_body = json.dumps({'public': is_public})
-        response = requests.put(path,
-                                cookies={'beegosessionID': self.session_id},
-                                data=request_body)
+        response = self._request('PUT', path, data=request_body)
         if response.status_code == 200:
             result = True
-            logging.debug(
-                "Success to set project id: {} with publicity: {}".format(
-                    project_id, is_public))
+            logger.debug("Success to set project id: %s with publicity: %s",
+                         project_id, is_public)
         else:
-            logging.error(
-                "Fail to set publicity to project id: {} with status code: {}".format(
-                    project_id, response.status_code))
+            logger.error(
+                "Fail to set publicity to project id: %s with status code: %s",
+                project_id, response.status_code)
         return result
 
     # GET /statistics
+    @_cached
     def get_statistics(self):
         result = None
         path = '%s://%s/api/statistics' % (self.protocol, self.host)
-        response = requests.get(path,
-                                cookies={'beegosessionID': self.session_id})
+        response = self._request('GET', path)
         if response.status_code == 200:
             result = response.json()
-            logging.debug("Successfully get statistics: {}".format(result))
+            logger.debug("Successfully get statistics: %s", _Payload(result))
         else:
-            logging.error("Fail to get statistics result")
+            logger.error("Fail to get statistics result")
         return result
 
     # GET /users
+    @_typed(User)
+    @_cached
     def get_users(self, user_name=None):
-        # TODO: support parameter
         result = None
         path = '%s://%s/api/users' % (self.protocol, self.host)
-        response = requests.get(path,
-                                cookies={'beegosessionID': self.session_id})
+        response = self._request('GET', path,
+                                 params=_params(username=user_name))
         if response.status_code == 200:
             result = response.json()
-            logging.debug("Successfully get users result: {}".format(result))
+            logger.debug("Successfully get users result: %s", _Payload(result))
         else:
-            logging.error("Fail to get users result")
+            logger.error("Fail to get users result")
         return result
 
     # POST /users
+    @_invalidates
     def create_user(self, username, email, password, realname, comment):
         result = False
         path = '%s://%s/api/users' % (self.protocol, self.host)
@@ -181,20 +627,19 @@ class HarborClient(object):
                                    'password': password,
                                    'realname': realname,
                                    'comment': comment})
-        response = requests.post(path,
-                                 cookies={'beegosessionID': self.session_id},
-                                 data=request_body)
+        response = self._request('POST', path, data=request_body)
         if response.status_code == 201:
             result = True
-            logging.debug("Successfully create user with username: {}".format(
-                username))
+            logger.debug("Successfully create user with username: %s",
+                         username)
         else:
-            logging.error(
-                "Fail to create user with username: {}, response code: {}".format(
-                    username, response.status_code))
+            logger.error(
+                "Fail to create user with username: %s, response code: %s",
+                username, response.status_code)
         return result
 
     # PUT /users/{user_id}
+    @_invalidates
     def update_user_profile(self, user_id, email, realname, comment):
         # TODO: support not passing comment
         result = False
@@ -203,33 +648,29 @@ class HarborClient(object):
         request_body = json.dumps({'email': email,
                                    'realname': realname,
                                    'comment': comment})
-        response = requests.put(path,
-                                cookies={'beegosessionID': self.session_id},
-                                data=request_body)
+        response = self._request('PUT', path, data=request_body)
         if response.status_code == 200:
             result = True
-            logging.debug(
-                "Successfully update user profile with user id: {}".format(
-                    user_id))
+            logger.debug("Successfully update user profile with user id: %s",
+                         user_id)
         else:
-            logging.error(
-                "Fail to update user profile with user id: {}, response code: {}".format(
-                    user_id, response.status_code))
+            logger.error(
+                "Fail to update user profile with user id: %s, response code: %s",
+                user_id, response.status_code)
         return result
 
     # DELETE /users/{user_id}
+    @_invalidates
     def delete_user(self, user_id):
         result = False
         path = '%s://%s/api/users/%s?user_id=%s' % (self.protocol, self.host,
                                                     user_id, user_id)
-        response = requests.delete(path,
-                                   cookies={'beegosessionID': self.session_id})
+        response = self._request('DELETE', path)
         if response.status_code == 200:
             result = True
-            logging.debug("Successfully delete user with id: {}".format(
-                user_id))
+            logger.debug("Successfully delete user with id: %s", user_id)
         else:
-            logging.error("Fail to delete user with id: {}".format(user_id))
+            logger.error("Fail to delete user with id: %s", user_id)
         return result
 
     # PUT /users/{user_id}/password
@@ -239,134 +680,282 @@ class HarborClient(object):
             self.protocol, self.host, user_id, user_id)
         request_body = json.dumps({'old_password': old_password,
                                    'new_password': new_password})
-        response = requests.put(path,
-                                cookies={'beegosessionID': self.session_id},
-                                data=request_body)
+        response = self._request('PUT', path, data=request_body)
         if response.status_code == 200:
             result = True
-            logging.debug(
-                "Successfully change password for user id: {}".format(user_id))
+            logger.debug("Successfully change password for user id: %s",
+                         user_id)
         else:
-            logging.error("Fail to change password for user id: {}".format(
-                user_id))
+            logger.error("Fail to change password for user id: %s", user_id)
         return result
 
     # PUT /users/{user_id}/sysadmin
+    @_invalidates
     def promote_as_admin(self, user_id):
         # TODO: always return 404, need more test
         result = False
         path = '%s://%s/api/users/%s/sysadmin?user_id=%s' % (
             self.protocol, self.host, user_id, user_id)
-        response = requests.put(path,
-                                cookies={'beegosessionID': self.session_id})
+        response = self._request('PUT', path)
         if response.status_code == 200:
             result = True
-            logging.debug(
-                "Successfully promote user as admin with user id: {}".format(
-                    user_id))
+            logger.debug("Successfully promote user as admin with user id: %s",
+                         user_id)
         else:
-            logging.error(
-                "Fail to promote user as admin with user id: {}, response code: {}".format(
-                    user_id, response.status_code))
+            logger.error(
+                "Fail to promote user as admin with user id: %s, response code: %s",
+                user_id, response.status_code)
         return result
 
     # GET /repositories
+    @_typed(Repository)
+    @_cached
     def get_repositories(self, project_id, query_string=None):
-        # TODO: support parameter
         result = None
         path = '%s://%s/api/repositories?project_id=%s' % (
             self.protocol, self.host, project_id)
-        response = requests.get(path,
-                                cookies={'beegosessionID': self.session_id})
+        response = self._request('GET', path,
+                                 params=_params(q=query_string))
         if response.status_code == 200:
             result = response.json()
-            logging.debug(
-                "Successfully get repositories with id: {}, result: {}".format(
-                    project_id, result))
+            logger.debug(
+                "Successfully get repositories with id: %s, result: %s",
+                project_id, _Payload(result))
         else:
-            logging.error("Fail to get repositories result with id: {}".format(
-                project_id))
+            logger.error("Fail to get repositories result with id: %s",
+                         project_id)
         return result
 
     # DELETE /repositories
+    @_invalidates
     def delete_repository(self, repo_name, tag=None):
-        # TODO: support to check tag
         # TODO: return 200 but the repo is not deleted, need more test
         result = False
         path = '%s://%s/api/repositories?repo_name=%s' % (self.protocol,
                                                           self.host, repo_name)
-        response = requests.delete(path,
-                                   cookies={'beegosessionID': self.session_id})
+        # Only delete the given tag instead of the whole repository
+        response = self._request('DELETE', path, params=_params(tag=tag))
         if response.status_code == 200:
             result = True
-            logging.debug("Successfully delete repository: {}".format(
-                repo_name))
+            logger.debug("Successfully delete repository: %s, tag: %s",
+                         repo_name, tag)
         else:
-            logging.error("Fail to delete repository: {}".format(repo_name))
+            logger.error("Fail to delete repository: %s, tag: %s", repo_name,
+                         tag)
         return result
 
     # Get /repositories/tags
+    @_typed(Tag, 'repo_name')
+    @_cached
     def get_repository_tags(self, repo_name):
         result = None
         path = '%s://%s/api/repositories/tags?repo_name=%s' % (
             self.protocol, self.host, repo_name)
-        response = requests.get(path,
-                                cookies={'beegosessionID': self.session_id})
+        response = self._request('GET', path, conditional=True)
         if response.status_code == 200:
             result = response.json()
-            logging.debug(
-                "Successfully get tag with repo name: {}, result: {}".format(
-                    repo_name, result))
+            logger.debug("Successfully get tag with repo name: %s, result: %s",
+                         repo_name, _Payload(result))
         else:
-            logging.error("Fail to get tags with repo name: {}".format(
-                repo_name))
+            logger.error("Fail to get tags with repo name: %s", repo_name)
         return result
 
     # GET /repositories/manifests
+    @_typed(Manifest, 'repo_name', 'tag')
+    @_cached
     def get_repository_manifests(self, repo_name, tag):
         result = None
         path = '%s://%s/api/repositories/manifests?repo_name=%s&tag=%s' % (
             self.protocol, self.host, repo_name, tag)
-        response = requests.get(path,
-                                cookies={'beegosessionID': self.session_id})
+        response = self._request('GET', path, conditional=True)
         if response.status_code == 200:
             result = response.json()
-            logging.debug(
-                "Successfully get manifests with repo name: {}, tag: {}, result: {}".format(
-                    repo_name, tag, result))
+            logger.debug(
+                "Successfully get manifests with repo name: %s, tag: %s, result: %s",
+                repo_name, tag, _Payload(result))
         else:
-            logging.error(
-                "Fail to get manifests with repo name: {}, tag: {}".format(
-                    repo_name, tag))
+            logger.error("Fail to get manifests with repo name: %s, tag: %s",
+                         repo_name, tag)
         return result
 
     # GET /repositories/top
+    @_cached
     def get_top_accessed_repositories(self, count=None):
         result = None
         path = '%s://%s/api/repositories/top' % (self.protocol, self.host)
         if count:
             path += "?count=%s" % (count)
-        response = requests.get(path,
-                                cookies={'beegosessionID': self.session_id})
+        response = self._request('GET', path)
         if response.status_code == 200:
             result = response.json()
-            logging.debug(
-                "Successfully get top accessed repositories, result: {}".format(
-                    result))
+            logger.debug(
+                "Successfully get top accessed repositories, result: %s",
+                _Payload(result))
         else:
-            logging.error("Fail to get top accessed repositories")
+            logger.error("Fail to get top accessed repositories")
         return result
 
     # GET /logs
+    @_typed(LogEntry)
     def get_logs(self, lines=None, start_time=None, end_time=None):
         result = None
         path = '%s://%s/api/logs' % (self.protocol, self.host)
-        response = requests.get(path,
-                                cookies={'beegosessionID': self.session_id})
+        response = self._request('GET', path,
+                                 params=_params(lines=lines,
+                                                start_time=start_time,
+                                                end_time=end_time))
         if response.status_code == 200:
             result = response.json()
-            logging.debug("Successfully get logs")
+            logger.debug("Successfully get logs")
         else:
-            logging.error("Fail to get logs and response code: {}".format(
-                response.status_code))
+            logger.error("Fail to get logs and response code: %s",
+                         response.status_code)
         return result
+
+    # Lazy iterators over the paginated list endpoints. Pages are requested
+    # with page and page_size and fetched only as the caller consumes them,
+    # page_size=None asks for the whole listing in one response.
+    # With prefetch=True the next page is requested in the background while
+    # the current one is consumed. With stream=True each response body is
+    # parsed incrementally from the socket, so memory does not grow with the
+    # response size. With models enabled they yield harborclient.models
+    # objects.
+    def iter_projects(self, project_name=None, is_public=None,
+                      page_size=PAGE_SIZE, prefetch=False, stream=False):
+        path = '%s://%s/api/projects' % (self.protocol, self.host)
+        return self._iter_pages(path,
+                                _params(project_name=project_name,
+                                        is_public=is_public), page_size,
+                                prefetch, stream, Project)
+
+    def iter_users(self, user_name=None, page_size=PAGE_SIZE, prefetch=False,
+                   stream=False):
+        path = '%s://%s/api/users' % (self.protocol, self.host)
+        return self._iter_pages(path, _params(username=user_name), page_size,
+                                prefetch, stream, User)
+
+    def iter_repositories(self, project_id, query_string=None,
+                          page_size=PAGE_SIZE, prefetch=False, stream=False):
+        path = '%s://%s/api/repositories' % (self.protocol, self.host)
+        return self._iter_pages(path,
+                                _params(project_id=project_id,
+                                        q=query_string), page_size, prefetch,
+                                stream, Repository)
+
+    def iter_logs(self, lines=None, start_time=None, end_time=None,
+                  page_size=PAGE_SIZE, prefetch=False, stream=False):
+        path = '%s://%s/api/logs' % (self.protocol, self.host)
+        return self._iter_pages(path,
+                                _params(lines=lines,
+                                        start_time=start_time,
+                                        end_time=end_time), page_size,
+                                prefetch, stream, LogEntry)
+
+    def _get_page(self, path, params, page, page_size, stream=False):
+        if page_size is not None:
+            params = dict(params, page=page, page_size=page_size)
+        response = self._request('GET', path, params=params, stream=stream)
+        if response.status_code != 200:
+            logger.error("Fail to get page %s of %s, response code: %s", page,
+                         path, response.status_code)
+            response.close()
+            return None, None
+        total = response.headers.get('X-Total-Count')
+        total = int(total) if total else None
+        if stream:
+            return iter_response_items(response), total
+        return response.json(), total
+
+    def _iter_pages(self, path, params, page_size, prefetch, stream=False,
+                    model=None):
+        # A streamed page is parsed while it downloads, so it is never
+        # prefetched
+        if not self.models:
+            model = None
+        executor = None
+        if prefetch and not stream and page_size is not None:
+            from concurrent.futures import ThreadPoolExecutor
+
+            executor = ThreadPoolExecutor(max_workers=1)
+        try:
+            page, count, first = 1, 0, None
+            items, total = self._get_page(path, params, page, page_size,
+                                          stream)
+            while items is not None:
+                future = None
+                if (executor is not None and len(items) == page_size and
+                        (total is None or count + len(items) < total)):
+                    future = executor.submit(self._get_page, path, params,
+                                             page + 1, page_size)
+                size, repeated = 0, False
+                for item in items:
+                    # A server ignoring page sends the first page again
+                    if size == 0 and page > 1 and item == first:
+                        repeated = True
+                        break
+                    if size == 0:
+                        first = item
+                    size += 1
+                    yield item if model is None else model(item)
+                if repeated:
+                    if hasattr(items, 'close'):
+                        items.close()
+                    break
+                count += size
+                # A short page, a server ignoring page_size or reaching the
+                # announced total all mean this is the last page
+                if (page_size is None or size != page_size or
+                        (total is not None and count >= total)):
+                    break
+                page += 1
+                if future is not None:
+                    items, total = future.result()
+                else:
+                    items, total = self._get_page(path, params, page,
+                                                  page_size, stream)
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True)
+
+    # Call one endpoint for many items on a worker pool, returning one
+    # BulkResult per item, see harborclient.bulk
+    def bulk(self, method, items, workers=8, rate=None):
+        from harborclient.bulk import run_bulk
+        return run_bulk(self, method, items, workers, rate)
+
+    # Items are repository names or (repo_name, tag) tuples
+    def bulk_delete_repositories(self, repositories, workers=8, rate=None):
+        return self.bulk('delete_repository', repositories, workers, rate)
+
+    # Items are project names or (project_name, is_public) tuples
+    def bulk_create_projects(self, projects, workers=8, rate=None):
+        return self.bulk('create_project', projects, workers, rate)
+
+    # Items are (project_id, is_public) tuples
+    def bulk_set_project_publicity(self, projects, workers=8, rate=None):
+        return self.bulk('set_project_publicity', projects, workers, rate)
+
+    # Items are user ids
+    def bulk_delete_users(self, user_ids, workers=8, rate=None):
+        return self.bulk('delete_user', user_ids, workers, rate)
+
+    # Dry-run a RetentionPolicy, call execute() on the plan to delete
+    def plan_retention(self, policy, project_pattern=None,
+                       repository_pattern=None, workers=8):
+        from harborclient.retention import plan_retention
+        return plan_retention(self, policy, project_pattern,
+                              repository_pattern, workers)
+
+    # Index the layers of every manifest, report() gives the bytes each
+    # project and repository holds alone or shares with others
+    def analyze_storage(self, project_pattern=None, repository_pattern=None,
+                        workers=8):
+        from harborclient.storage import analyze
+        return analyze(self, project_pattern, repository_pattern, workers)
+
+    # Walk projects, repositories, tags and manifests concurrently
+    def crawl(self, project_pattern=None, repository_pattern=None,
+              manifests=True, workers=8):
+        from harborclient.crawler import crawl
+        return crawl(self, project_pattern, repository_pattern, manifests,
+                     workers)
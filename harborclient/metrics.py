@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+
+import threading
+from collections import namedtuple
+
+# One request sent over the network. status_code is None when it failed
+# with error, attempt counts from 0 and the first retry is attempt 1.
+RequestEvent = namedtuple('RequestEvent', [
+    'host', 'method', 'endpoint', 'status_code', 'latency', 'bytes_sent',
+    'bytes_received', 'attempt', 'not_modified', 'error'
+])
+
+# Upper bounds of the latency histogram buckets in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class Hook(object):
+    """Base of the instrumentation hooks passed to HarborClient(hooks=...).
+
+    start_span() is called before each request is sent and its return value
+    is handed back to on_request() once it completed. on_retry() is called
+    before a request is sent again and on_cache() on every lookup of the
+    response cache. Subclasses override the ones they need.
+    """
+
+    def start_span(self, method, endpoint, attempt):
+        return None
+
+    def on_request(self, event, span):
+        pass
+
+    def on_retry(self, method, endpoint, attempt, backoff):
+        pass
+
+    def on_cache(self, endpoint, hit):
+        pass
+
+
+class _Histogram(object):
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        index = 0
+        while index < len(LATENCY_BUCKETS) and value > LATENCY_BUCKETS[index]:
+            index += 1
+        self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsCollector(Hook):
+    """Aggregates request counts, latencies, bytes, retries and cache hits.
+
+    snapshot() returns the numbers as plain dicts and prometheus() renders
+    them in the Prometheus text exposition format, ready to be served on a
+    /metrics endpoint.
+    """
+
+    def __init__(self, prefix='harbor_client'):
+        self.prefix = prefix
+        self.requests = {}
+        self.latencies = {}
+        self.bytes_sent = {}
+        self.bytes_received = {}
+        self.retries = {}
+        self.cache = {}
+        self._lock = threading.Lock()
+
+    def on_request(self, event, span):
+        status = str(event.status_code) if event.error is None else 'error'
+        key = (event.endpoint, event.method, status)
+        with self._lock:
+            self.requests[key] = self.requests.get(key, 0) + 1
+            histogram = self.latencies.get(event.endpoint)
+            if histogram is None:
+                histogram = self.latencies[event.endpoint] = _Histogram()
+            histogram.observe(event.latency)
+            self.bytes_sent[event.endpoint] = self.bytes_sent.get(
+                event.endpoint, 0) + event.bytes_sent
+            self.bytes_received[event.endpoint] = self.bytes_received.get(
+                event.endpoint, 0) + event.bytes_received
+
+    def on_retry(self, method, endpoint, attempt, backoff):
+        with self._lock:
+            self.retries[endpoint] = self.retries.get(endpoint, 0) + 1
+
+    def on_cache(self, endpoint, hit):
+        key = (endpoint, 'hit' if hit else 'miss')
+        with self._lock:
+            self.cache[key] = self.cache.get(key, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'requests': dict(self.requests),
+                'latencies': dict((endpoint, {'count': h.count,
+                                              'sum': h.sum,
+                                              'buckets': list(h.counts)})
+                                  for endpoint, h in self.latencies.items()),
+                'bytes_sent': dict(self.bytes_sent),
+                'bytes_received': dict(self.bytes_received),
+                'retries': dict(self.retries),
+                'cache': dict(self.cache),
+            }
+
+    def prometheus(self):
+        prefix = self.prefix
+        snapshot = self.snapshot()
+        lines = ['# TYPE %s_requests_total counter' % prefix]
+        for (endpoint, method, status), value in sorted(
+                snapshot['requests'].items()):
+            lines.append('%s_requests_total{endpoint="%s",method="%s",'
+                         'status="%s"} %d' % (prefix, endpoint, method,
+                                              status, value))
+
+        lines.append('# TYPE %s_request_duration_seconds histogram' % prefix)
+        for endpoint, histogram in sorted(snapshot['latencies'].items()):
+            cumulative = 0
+            bounds = [repr(float(b)) for b in LATENCY_BUCKETS] + ['+Inf']
+            for bound, count in zip(bounds, histogram['buckets']):
+                cumulative += count
+                lines.append('%s_request_duration_seconds_bucket{endpoint="%s",'
+                             'le="%s"} %d' % (prefix, endpoint, bound,
+                                              cumulative))
+            lines.append('%s_request_duration_seconds_sum{endpoint="%s"} %r' %
+                         (prefix, endpoint, histogram['sum']))
+            lines.append('%s_request_duration_seconds_count{endpoint="%s"} %d'
+                         % (prefix, endpoint, histogram['count']))
+
+        for name in ('bytes_sent', 'bytes_received', 'retries'):
+            lines.append('# TYPE %s_%s_total counter' % (prefix, name))
+            for endpoint, value in sorted(snapshot[name].items()):
+                lines.append('%s_%s_total{endpoint="%s"} %d' %
+                             (prefix, name, endpoint, value))
+
+        lines.append('# TYPE %s_cache_total counter' % prefix)
+        for (endpoint, result), value in sorted(snapshot['cache'].items()):
+            lines.append('%s_cache_total{endpoint="%s",result="%s"} %d' %
+                         (prefix, endpoint, result, value))
+        return '\n'.join(lines) + '\n'
+
+
+class TracingHook(Hook):
+    """Reports every request as a span of an OpenTelemetry style tracer.
+
+    The tracer only needs start_span(name, attributes=...) returning spans
+    with set_attribute(), record_exception() and end(), so an
+    opentelemetry.trace tracer can be passed in directly.
+    """
+
+    def __init__(self, tracer):
+        self.tracer = tracer
+
+    def start_span(self, method, endpoint, attempt):
+        return self.tracer.start_span('%s %s' % (method, endpoint),
+                                      attributes={
+                                          'http.method': method,
+                                          'http.route': endpoint,
+                                          'harbor.attempt': attempt,
+                                      })
+
+    def on_request(self, event, span):
+        if span is None:
+            return
+        if event.status_code is not None:
+            span.set_attribute('http.status_code', event.status_code)
+        span.set_attribute('http.response_content_length',
+                           event.bytes_received)
+        if event.error is not None:
+            span.record_exception(event.error)
+        span.end()
@@ -0,0 +1,344 @@
+#!/usr/bin/env python
+
+import json
+import math
+import sys
+import time
+from array import array
+
+# Kinds of model fields, deciding how a raw value is parsed and stored
+INT = 'int'
+STR = 'str'
+BOOL = 'bool'
+TIME = 'time'
+
+# HarborClient(models=TABLE) returns listings as a Table
+TABLE = 'table'
+
+# Stand-ins for None in the typed columns of a Table
+_NONE_INT = -2**63
+_NONE_BOOL = -1
+
+
+def parse_time(value):
+    # Parse harbor's RFC 3339 timestamps, e.g. 2016-07-27T09:45:31.123456Z
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    value = value.strip().replace('+00:00', 'Z').rstrip('Z')
+    fraction = 0.0
+    if '.' in value:
+        value, digits = value.split('.', 1)
+        fraction = float('0.' + digits) if digits.isdigit() else 0.0
+    import calendar
+
+    try:
+        return calendar.timegm(time.strptime(value,
+                                             '%Y-%m-%dT%H:%M:%S')) + fraction
+    except ValueError:
+        return None
+
+
+_PARSERS = {
+    INT: int,
+    STR: lambda value: value,
+    BOOL: bool,
+    TIME: parse_time,
+}
+
+
+def to_json(value):
+    # JSON of a model, a list of models or a Table, anything else is
+    # returned as is
+    if isinstance(value, Model):
+        return value.raw
+    if isinstance(value, Table):
+        return value.to_json()
+    if isinstance(value, list) and value and isinstance(value[0], Model):
+        return [item.raw for item in value]
+    return value
+
+
+class _Field(object):
+    # Reads one key of the raw JSON object, parsed on every access so
+    # nothing is converted or stored until it is asked for
+    __slots__ = ('key', 'parse')
+
+    def __init__(self, key, kind):
+        self.key = key
+        self.parse = _PARSERS[kind]
+
+    def __get__(self, model, owner):
+        if model is None:
+            return self
+        raw = model.raw
+        value = raw.get(self.key) if isinstance(raw, dict) else None
+        return None if value is None else self.parse(value)
+
+
+class _Name(_Field):
+    # Older harbor lists repositories and tags as plain name strings
+    __slots__ = ()
+
+    def __get__(self, model, owner):
+        if model is None:
+            return self
+        if isinstance(model.raw, str):
+            return model.raw
+        return _Field.__get__(self, model, owner)
+
+
+def _fields(cls):
+    for name, kind in cls.FIELDS:
+        field = _Name if name == 'name' else _Field
+        setattr(cls, name, field(name, kind))
+    return cls
+
+
+class Model(object):
+    """Typed read-only view of one JSON object returned by harbor.
+
+    Fields are parsed from `raw`, the untouched JSON, only when read. The
+    classes use __slots__, so a model adds no per-instance dict on top of
+    the JSON it wraps, but it does keep that JSON, a Table is what stores
+    big listings in less memory. CONTEXT names the arguments of the call a
+    model came from that the JSON does not repeat, e.g. the repository of a
+    tag.
+    """
+
+    __slots__ = ('raw', )
+
+    # (JSON key, kind) of each field, read as attributes of the same name
+    FIELDS = ()
+    CONTEXT = ()
+
+    def __init__(self, raw):
+        self.raw = raw
+
+    @classmethod
+    def wrap(cls, data, *context):
+        # Model or list of models of a JSON response
+        if isinstance(data, list):
+            return [cls(item, *context) for item in data]
+        return cls(data, *context)
+
+    def __eq__(self, other):
+        return (type(self) is type(other) and self.raw == other.raw and all(
+            getattr(self, name) == getattr(other, name)
+            for name in self.CONTEXT))
+
+    def __repr__(self):
+        names = self.CONTEXT + tuple(field[0] for field in self.FIELDS[:2])
+        return '%s(%s)' % (type(self).__name__, ', '.join(
+            '%s=%r' % (name, getattr(self, name)) for name in names))
+
+
+@_fields
+class Project(Model):
+    __slots__ = ()
+    FIELDS = (('project_id', INT),
+              ('name', STR),
+              ('owner_id', INT),
+              ('owner_name', STR),
+              ('public', BOOL),
+              ('repo_count', INT),
+              ('creation_time', TIME),
+              ('update_time', TIME))
+
+
+@_fields
+class Repository(Model):
+    __slots__ = ()
+    FIELDS = (('name', STR),
+              ('id', INT),
+              ('project_id', INT),
+              ('description', STR),
+              ('pull_count', INT),
+              ('star_count', INT),
+              ('tags_count', INT),
+              ('creation_time', TIME),
+              ('update_time', TIME))
+
+
+@_fields
+class Tag(Model):
+    __slots__ = ('repository', )
+    FIELDS = (('name', STR),
+              ('digest', STR),
+              ('size', INT),
+              ('created', TIME))
+    CONTEXT = ('repository', )
+
+    def __init__(self, raw, repository=None):
+        self.raw = raw
+        self.repository = repository
+
+
+@_fields
+class Manifest(Model):
+    __slots__ = ('repository', 'tag', '_config')
+    FIELDS = (('digest', STR), )
+    CONTEXT = ('repository', 'tag')
+
+    def __init__(self, raw, repository=None, tag=None):
+        self.raw = raw
+        self.repository = repository
+        self.tag = tag
+        self._config = None
+
+    @property
+    def manifest(self):
+        return self.raw.get('manifest') or {}
+
+    @property
+    def schema_version(self):
+        return self.manifest.get('schemaVersion')
+
+    @property
+    def media_type(self):
+        return self.manifest.get('mediaType')
+
+    @property
+    def config(self):
+        # The image config comes as a JSON string, decoded on first use
+        if self._config is None:
+            config = self.raw.get('config')
+            if isinstance(config, str):
+                try:
+                    config = json.loads(config)
+                except ValueError:
+                    config = None
+            self._config = config if isinstance(config, dict) else {}
+        return self._config
+
+    @property
+    def created(self):
+        return parse_time(self.config.get('created'))
+
+    @property
+    def layers(self):
+        # (digest, size) of each layer, base layer first
+        return [(layer.get('digest'), layer.get('size') or 0)
+                for layer in self.manifest.get('layers') or ()]
+
+    @property
+    def size(self):
+        return sum(size for _, size in self.layers)
+
+
+@_fields
+class User(Model):
+    __slots__ = ()
+    FIELDS = (('user_id', INT),
+              ('username', STR),
+              ('email', STR),
+              ('realname', STR),
+              ('comment', STR),
+              ('has_admin_role', BOOL),
+              ('creation_time', TIME),
+              ('update_time', TIME))
+
+
+@_fields
+class LogEntry(Model):
+    __slots__ = ()
+    FIELDS = (('log_id', INT),
+              ('user_id', INT),
+              ('project_id', INT),
+              ('repo_name', STR),
+              ('repo_tag', STR),
+              ('operation', STR),
+              ('op_time', TIME),
+              ('username', STR))
+
+
+class _Column(object):
+    # Typed array of one field, None kept as an out of band value
+    __slots__ = ('kind', 'values', 'none', 'intern')
+
+    def __init__(self, kind, intern=False):
+        self.kind = kind
+        # Only worth it for values repeated on many rows, e.g. the
+        # repository of every tag, unique names would only grow the table
+        self.intern = intern
+        if kind == INT:
+            self.values, self.none = array('q'), _NONE_INT
+        elif kind == TIME:
+            self.values, self.none = array('d'), float('nan')
+        elif kind == BOOL:
+            self.values, self.none = array('b'), _NONE_BOOL
+        else:
+            self.values, self.none = [], None
+
+    def append(self, value):
+        if value is None:
+            self.values.append(self.none)
+        elif self.intern and isinstance(value, str):
+            self.values.append(sys.intern(value))
+        else:
+            self.values.append(value)
+
+    def __getitem__(self, index):
+        value = self.values[index]
+        if self.kind == TIME:
+            return None if math.isnan(value) else value
+        if self.kind in (INT, BOOL) and value == self.none:
+            return None
+        return bool(value) if self.kind == BOOL else value
+
+
+class Table(object):
+    """Columnar collection of models for big listings.
+
+    Each field is stored parsed in its own column, numbers and times in
+    compact arrays, instead of one dict per item.
+    Rows come back as models whose raw JSON only holds the stored fields,
+    with times as unix timestamps. Manifests are nested, so only the
+    listing models (Project, Repository, Tag, User, LogEntry) fit a table.
+    """
+
+    def __init__(self, model, items=()):
+        self.model = model
+        self._columns = [(name, _Column(kind)) for name, kind in model.FIELDS]
+        self._context = [(name, _Column(STR, intern=True))
+                         for name in model.CONTEXT]
+        self._size = 0
+        self.extend(items)
+
+    def append(self, item):
+        # item is a model or the raw JSON of one
+        if not isinstance(item, self.model):
+            item = self.model(item)
+        for name, column in self._columns + self._context:
+            column.append(getattr(item, name))
+        self._size += 1
+
+    def extend(self, items):
+        for item in items:
+            self.append(item)
+
+    def column(self, name):
+        for column_name, column in self._columns + self._context:
+            if column_name == name:
+                return [column[index] for index in range(self._size)]
+        raise KeyError(name)
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("Table index out of range")
+        raw = dict((name, column[index]) for name, column in self._columns)
+        return self.model(raw, *[column[index]
+                                 for _, column in self._context])
+
+    def __iter__(self):
+        for index in range(self._size):
+            yield self[index]
+
+    def to_json(self):
+        return [row.raw for row in self]
@@ -0,0 +1,266 @@
+#!/usr/bin/env python
+
+import logging
+import threading
+import time
+
+import requests
+
+from harborclient.exceptions import CircuitOpenError
+from harborclient.harborclient import HarborClient
+from harborclient.metrics import Hook
+
+logger = logging.getLogger(__name__)
+
+# Calls any replica can answer, routed to the fastest healthy host
+READ_METHODS = (
+    'get_project_id_from_name',
+    'search',
+    'get_projects',
+    'check_project_exist',
+    'get_statistics',
+    'get_users',
+    'get_repositories',
+    'get_repository_tags',
+    'get_repository_manifests',
+    'get_top_accessed_repositories',
+    'get_logs',
+)
+
+# Lazy iterators, routed like reads when they are created
+ITER_METHODS = (
+    'iter_projects',
+    'iter_users',
+    'iter_repositories',
+    'iter_logs',
+)
+
+# Calls changing the registry, always sent to the primary
+WRITE_METHODS = (
+    'create_project',
+    'set_project_publicity',
+    'create_user',
+    'update_user_profile',
+    'delete_user',
+    'change_password',
+    'promote_as_admin',
+    'delete_repository',
+    'bulk',
+    'bulk_delete_repositories',
+    'bulk_create_projects',
+    'bulk_set_project_publicity',
+    'bulk_delete_users',
+)
+
+# Errors meaning the host could not be reached or answered
+_HOST_ERRORS = (requests.RequestException, CircuitOpenError)
+
+
+class Endpoint(object):
+    """One host of a HarborClientPool and what the pool knows about it."""
+
+    def __init__(self, client, primary=False):
+        self.client = client
+        self.primary = primary
+        self.healthy = True
+        # Smoothed latency in seconds, None until the first request
+        self.latency = None
+        self.failures = 0
+        self.checked_at = None
+
+    @property
+    def host(self):
+        return self.client.host
+
+    def status(self):
+        return {'host': self.host,
+                'primary': self.primary,
+                'healthy': self.healthy,
+                'latency': self.latency,
+                'failures': self.failures}
+
+
+class _EndpointHook(Hook):
+    # Feeds the latency of every request a client sends to its endpoint
+    def __init__(self, pool, endpoint):
+        self.pool = pool
+        self.endpoint = endpoint
+
+    def on_request(self, event, span):
+        if event.error is None and event.status_code < 500:
+            self.pool._observe(self.endpoint, event.latency)
+
+
+class HarborClientPool(object):
+    """Clients of a primary harbor and its replicas behind one interface.
+
+    Writes go to the primary. Reads go to the healthy host with the lowest
+    smoothed latency, and move on to the next one when a host can not be
+    reached, answers with a 5xx or, being a replica that may lag behind
+    replication, does not know the item yet. A background thread probes
+    every host each `health_interval` seconds, which measures the latency
+    of idle hosts and brings recovered ones back. Hosts are given as names
+    or as ready HarborClient objects. The remaining keyword arguments
+    are passed to the clients the pool creates.
+    """
+
+    def __init__(self, primary, replicas=(), user=None, password=None,
+                 protocol="http", health_interval=10, alpha=0.3,
+                 **client_kwargs):
+        self.alpha = alpha
+        self._lock = threading.Lock()
+        self.endpoints = []
+        for host in [primary] + list(replicas):
+            if isinstance(host, HarborClient):
+                client = host
+            else:
+                client = HarborClient(host, user, password, protocol,
+                                      **client_kwargs)
+            endpoint = Endpoint(client, primary=not self.endpoints)
+            client.hooks.append(_EndpointHook(self, endpoint))
+            self.endpoints.append(endpoint)
+        self.primary = self.endpoints[0]
+
+        self.health_interval = health_interval
+        self._stop = threading.Event()
+        self._thread = None
+        if health_interval:
+            self._thread = threading.Thread(target=self._health_loop,
+                                            name='harbor-pool-health')
+            self._thread.daemon = True
+            self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        for endpoint in self.endpoints:
+            endpoint.client.close()
+
+    def status(self):
+        with self._lock:
+            return [endpoint.status() for endpoint in self.endpoints]
+
+    def read_order(self):
+        # Healthy hosts first, fastest first. Hosts not measured yet count
+        # as fast so they get measured, ties go to the primary.
+        with self._lock:
+            return sorted(self.endpoints,
+                          key=lambda e: (not e.healthy, e.latency or 0,
+                                         not e.primary))
+
+    def _observe(self, endpoint, latency):
+        with self._lock:
+            if endpoint.latency is None:
+                endpoint.latency = latency
+            else:
+                endpoint.latency += self.alpha * (latency - endpoint.latency)
+            if not endpoint.healthy:
+                logger.info("Harbor host %s is back", endpoint.host)
+            endpoint.healthy = True
+            endpoint.failures = 0
+
+    def _mark_down(self, endpoint, reason):
+        with self._lock:
+            if endpoint.healthy:
+                logger.warning("Harbor host %s is down: %s", endpoint.host,
+                               reason)
+            endpoint.healthy = False
+            endpoint.failures += 1
+
+    def _read(self, name, *args, **kwargs):
+        error = result = None
+        for endpoint in self.read_order():
+            # A call answered from the cache sends nothing, and must not be
+            # judged by an earlier response of this thread
+            endpoint.client.last_response = None
+            try:
+                result = getattr(endpoint.client, name)(*args, **kwargs)
+            except _HOST_ERRORS as e:
+                self._mark_down(endpoint, e)
+                error = e
+                continue
+            response = endpoint.client.last_response
+            if response is None:
+                return result
+            status_code = response.status_code
+            if status_code >= 500:
+                self._mark_down(endpoint, status_code)
+                continue
+            if status_code == 404 and not endpoint.primary:
+                # Not replicated yet, the primary or another replica may
+                # have it already
+                continue
+            return result
+        if error is not None and result is None:
+            raise error
+        return result
+
+    def _iter(self, name, *args, **kwargs):
+        return getattr(self.read_order()[0].client, name)(*args, **kwargs)
+
+    def _write(self, name, *args, **kwargs):
+        return getattr(self.primary.client, name)(*args, **kwargs)
+
+    def crawl(self, project_pattern=None, repository_pattern=None,
+              manifests=True, workers=8):
+        # Every request of the crawl is routed like a read
+        from harborclient.crawler import crawl
+        return crawl(self, project_pattern, repository_pattern, manifests,
+                     workers)
+
+    def check_health(self):
+        # Probe every host once, as the health thread does
+        for endpoint in self.endpoints:
+            self._probe(endpoint)
+
+    def _probe(self, endpoint):
+        client = endpoint.client
+        start = time.time()
+        try:
+            response = client.session.get(
+                '%s://%s/api/projects' % (client.protocol, client.host),
+                params={'page': 1, 'page_size': 1}, timeout=client.timeout)
+            response.close()
+        except requests.RequestException as e:
+            self._mark_down(endpoint, e)
+            return
+        finally:
+            endpoint.checked_at = time.time()
+        if response.status_code >= 500:
+            self._mark_down(endpoint, response.status_code)
+        else:
+            self._observe(endpoint, time.time() - start)
+
+    def _health_loop(self):
+        while not self._stop.wait(self.health_interval):
+            try:
+                self.check_health()
+            except Exception:
+                logger.exception("Fail to check harbor hosts")
+
+
+def _routed_method(name, route):
+    def method(self, *args, **kwargs):
+        return route(self, name, *args, **kwargs)
+
+    method.__name__ = name
+    method.__doc__ = getattr(HarborClient, name).__doc__
+    return method
+
+
+for _name in READ_METHODS:
+    setattr(HarborClientPool, _name,
+            _routed_method(_name, HarborClientPool._read))
+for _name in ITER_METHODS:
+    setattr(HarborClientPool, _name,
+            _routed_method(_name, HarborClientPool._iter))
+for _name in WRITE_METHODS:
+    setattr(HarborClientPool, _name,
+            _routed_method(_name, HarborClientPool._write))
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+
+import threading
+import time
+
+
+class TokenBucket(object):
+    """Thread-safe token bucket allowing `rate` calls per second.
+
+    Up to `burst` tokens accumulate while idle, acquire() blocks until a
+    token is available.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(rate, 1))
+        self._tokens = self.burst
+        self._updated = time.time()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        while True:
+            with self._lock:
+                now = time.time()
+                self._tokens = min(self.burst, self._tokens +
+                                   (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+READ_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS'])
+
+
+class RateLimiter(object):
+    """Token buckets per host and endpoint class.
+
+    read and write are the calls per second allowed to each host for GET
+    and HEAD requests and for the other methods, None means unlimited.
+    hosts overrides them per host, e.g. {'harbor.example.com': {'write': 2}}.
+    One limiter can be shared by several clients of the same host.
+    """
+
+    def __init__(self, read=None, write=None, hosts=None, burst=None):
+        self.rates = {'read': read, 'write': write}
+        self.hosts = hosts or {}
+        self.burst = burst
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, host, endpoint_class):
+        key = (host, endpoint_class)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            with self._lock:
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    rate = self.hosts.get(host, {}).get(
+                        endpoint_class, self.rates[endpoint_class])
+                    bucket = TokenBucket(rate, self.burst) if rate else False
+                    self._buckets[key] = bucket
+        return bucket
+
+    def acquire(self, host, method):
+        endpoint_class = 'read' if method in READ_METHODS else 'write'
+        bucket = self.bucket(host, endpoint_class)
+        if bucket:
+            bucket.acquire()
+
+
+class AdaptiveConcurrency(object):
+    """Concurrency limit tuned with additive increase, multiplicative
+    decrease (AIMD).
+
+    acquire() blocks while `limit` requests are in flight. Each successful
+    request grows the limit by 1 / limit, about one more slot per round
+    trip. An overloaded or failed response (429, 500, 502, 503 or 504), a
+    transport error or a latency above latency_target multiplies it by
+    `decrease`, at most once per round trip so one burst of errors only
+    halves it once.
+    """
+
+    def __init__(self, initial=8, minimum=1, maximum=64, latency_target=None,
+                 decrease=0.5):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_target = latency_target
+        self.decrease = decrease
+        self.in_flight = 0
+        self._last_decrease = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, start, latency, failed=False):
+        with self._condition:
+            self.in_flight -= 1
+            slow = (self.latency_target is not None and
+                    latency > self.latency_target)
+            if failed or slow:
+                # Requests sent before the last decrease saw the old limit
+                if start >= self._last_decrease:
+                    self.limit = max(self.minimum,
+                                     self.limit * self.decrease)
+                    self._last_decrease = time.time()
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._condition.notify_all()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+
+import random
+import re
+import threading
+import time
+from urllib.parse import urlparse
+
+from harborclient.exceptions import CircuitOpenError
+
+
+def endpoint_of(url):
+    # API path of a url with ids replaced, e.g. /api/users/{id}/password
+    return re.sub(r'/\d+(?=/|$)', '/{id}', urlparse(url).path)
+
+
+class RetryPolicy(object):
+    """When and how long to wait before sending a request again.
+
+    Only idempotent methods are retried, after connection errors, timeouts
+    or one of the status_forcelist responses. The n-th retry waits a random
+    time up to backoff_factor * 2 ** n seconds (full jitter), capped at
+    max_backoff, or the server's Retry-After when it sends one.
+    """
+
+    def __init__(self, total=2, backoff_factor=0.1, max_backoff=10,
+                 jitter=True, status_forcelist=(429, 500, 502, 503, 504),
+                 methods=('GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS')):
+        self.total = total
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.status_forcelist = frozenset(status_forcelist)
+        self.methods = frozenset(methods)
+
+    def should_retry(self, method, attempt, status_code=None):
+        if attempt >= self.total or method not in self.methods:
+            return False
+        return status_code is None or status_code in self.status_forcelist
+
+    def backoff(self, attempt, response=None):
+        retry_after = response is not None and response.headers.get(
+            'Retry-After')
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.max_backoff)
+        backoff = min(self.max_backoff, self.backoff_factor * 2 ** attempt)
+        return random.uniform(0, backoff) if self.jitter else backoff
+
+
+class CircuitBreaker(object):
+    """Fails fast after repeated errors from a host.
+
+    After failure_threshold consecutive failures (connection errors,
+    timeouts or 5xx responses) the circuit opens and requests raise
+    CircuitOpenError without being sent. After reset_timeout seconds one
+    trial request is let through, closing the circuit again on success. A
+    trial whose outcome is never recorded is replaced by a new one after
+    another reset_timeout.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def before_request(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            if time.time() - self.opened_at >= self.reset_timeout:
+                # opened_at then marks the start of the trial
+                self.state = self.HALF_OPEN
+                self.opened_at = time.time()
+                return
+            raise CircuitOpenError(
+                "Circuit is {} after {} failures".format(self.state,
+                                                         self.failures))
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if (self.state == self.HALF_OPEN or
+                    self.failures >= self.failure_threshold):
+                self.state = self.OPEN
+                self.opened_at = time.time()
+
+
+class LatencyTracker(object):
+    """Derives read timeouts from the latency observed per endpoint.
+
+    Like TCP's retransmission timeout it keeps a smoothed latency and its
+    deviation, and suggests smoothed + 4 * deviation clamped between
+    min_timeout and the configured timeout, unbounded when that is None.
+    """
+
+    def __init__(self, min_timeout=1.0, alpha=0.125, beta=0.25):
+        self.min_timeout = min_timeout
+        self.alpha = alpha
+        self.beta = beta
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def observe(self, endpoint, latency):
+        with self._lock:
+            stats = self._stats.get(endpoint)
+            if stats is None:
+                self._stats[endpoint] = (latency, latency / 2)
+                return
+            smoothed, deviation = stats
+            deviation = ((1 - self.beta) * deviation +
+                         self.beta * abs(smoothed - latency))
+            smoothed = (1 - self.alpha) * smoothed + self.alpha * latency
+            self._stats[endpoint] = (smoothed, deviation)
+
+    def timeout(self, endpoint, maximum):
+        stats = self._stats.get(endpoint)
+        if stats is None:
+            return maximum
+        timeout = stats[0] + 4 * stats[1]
+        if maximum is not None:
+            timeout = min(maximum, timeout)
+        return max(self.min_timeout, timeout)
@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+
+import fnmatch
+import hashlib
+import json
+import logging
+import time
+from collections import namedtuple
+
+from harborclient.crawler import crawl, item_name
+from harborclient.models import parse_time
+
+logger = logging.getLogger(__name__)
+
+# Metadata of one tag. created is a unix timestamp or None when unknown,
+# digest the registry's manifest digest or None when harbor does not report
+# it. manifest_key tells tags sharing a manifest apart from the others, it is
+# the digest or, without one, a hash of the manifest that only compares
+# equal between tags and is never shown as a digest.
+TagInfo = namedtuple('TagInfo', ['project', 'repository', 'tag', 'created',
+                                 'digest', 'manifest_key'])
+TagInfo.__new__.__defaults__ = (None, )
+
+# One tag the plan would delete and why
+PlanItem = namedtuple('PlanItem', ['repository', 'tag', 'created', 'digest',
+                                   'reason'])
+
+
+def tag_info(project, repository, tag, manifest):
+    # The crawl yields tag names, creation time and digest come from the
+    # manifest
+    created = digest = manifest_key = None
+    if isinstance(manifest, dict):
+        digest = manifest.get('digest')
+        config = manifest.get('config')
+        if isinstance(config, str):
+            try:
+                config = json.loads(config)
+            except ValueError:
+                config = None
+        if isinstance(config, dict):
+            created = config.get('created')
+        manifest_key = digest
+        if digest is None and manifest.get('manifest') is not None:
+            manifest_key = hashlib.sha256(json.dumps(
+                manifest['manifest'], sort_keys=True).encode(
+                    'utf-8')).hexdigest()
+    return TagInfo(project, repository, item_name(tag), parse_time(created),
+                   digest, manifest_key)
+
+
+def _manifest_key(tag):
+    return tag.manifest_key or tag.digest
+
+
+class TagIndex(object):
+    """Tags indexed by repository, creation time and manifest."""
+
+    def __init__(self, tags=()):
+        self.repositories = {}
+        self.manifests = {}
+        for tag in tags:
+            self.add(tag)
+
+    def add(self, tag):
+        self.repositories.setdefault(tag.repository, []).append(tag)
+        if _manifest_key(tag):
+            self.manifests.setdefault(_manifest_key(tag), []).append(tag)
+
+    def newest_first(self, repository):
+        # Tags without a creation time sort as the newest so they are kept
+        return sorted(self.repositories.get(repository, []),
+                      key=lambda tag: (tag.created is not None,
+                                       -(tag.created or 0), tag.tag))
+
+    def __len__(self):
+        return sum(len(tags) for tags in self.repositories.values())
+
+
+class RetentionPolicy(object):
+    """Which tags to keep.
+
+    keep_last keeps the newest N tags of every repository, older_than only
+    deletes tags created more than that many seconds (or timedelta) ago and
+    keep_tags lists glob patterns of tags never deleted, e.g. "latest".
+    With keep_referenced a tag sharing its manifest digest with a kept tag
+    is kept too, since deleting it would delete the kept tag's manifest.
+    """
+
+    def __init__(self, keep_last=None, older_than=None, keep_tags=(),
+                 keep_referenced=True):
+        if keep_last is None and older_than is None:
+            raise ValueError("Retention policy needs keep_last or older_than")
+        if hasattr(older_than, 'total_seconds'):
+            older_than = older_than.total_seconds()
+        self.keep_last = keep_last
+        self.older_than = older_than
+        self.keep_tags = keep_tags
+        self.keep_referenced = keep_referenced
+
+    def evaluate(self, index, now=None):
+        now = time.time() if now is None else now
+        deletes = []
+        for repository in sorted(index.repositories):
+            tags = index.newest_first(repository)
+            kept, candidates = [], []
+            for position, tag in enumerate(tags):
+                if self.keep_last is not None and position < self.keep_last:
+                    kept.append(tag)
+                elif any(fnmatch.fnmatchcase(tag.tag, pattern)
+                         for pattern in self.keep_tags):
+                    kept.append(tag)
+                elif self.older_than is not None and (
+                        tag.created is None or
+                        now - tag.created < self.older_than):
+                    kept.append(tag)
+                else:
+                    candidates.append(tag)
+
+            kept_manifests = set(_manifest_key(tag) for tag in kept
+                                 if _manifest_key(tag))
+            for tag in candidates:
+                if (self.keep_referenced and
+                        _manifest_key(tag) in kept_manifests):
+                    continue
+                deletes.append(PlanItem(repository, tag.tag, tag.created,
+                                        tag.digest, self._reason(tag, now)))
+        return deletes
+
+    def _reason(self, tag, now):
+        reasons = []
+        if self.keep_last is not None:
+            reasons.append("not in last {}".format(self.keep_last))
+        if self.older_than is not None:
+            reasons.append("older than {}s".format(int(now - tag.created)))
+        return ", ".join(reasons) or "no rule keeps it"
+
+
+class RetentionPlan(object):
+    """Dry-run result of a retention policy, run it with execute()."""
+
+    def __init__(self, client, index, deletes):
+        self.client = client
+        self.index = index
+        self.deletes = deletes
+
+    def __iter__(self):
+        return iter(self.deletes)
+
+    def __len__(self):
+        return len(self.deletes)
+
+    def summary(self):
+        return {'tags': len(self.index),
+                'repositories': len(self.index.repositories),
+                'delete': len(self.deletes),
+                'keep': len(self.index) - len(self.deletes)}
+
+    def execute(self, workers=8, rate=None):
+        # Returns one BulkResult per deleted tag
+        results = self.client.bulk_delete_repositories(
+            [(item.repository, item.tag) for item in self.deletes], workers,
+            rate)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Successfully execute retention plan: %s",
+                         self.summary())
+        return results
+
+
+def collect(client, project_pattern=None, repository_pattern=None,
+            workers=8):
+    # Fetch tag and manifest metadata concurrently into a TagIndex
+    index = TagIndex()
+    for record in crawl(client, project_pattern, repository_pattern,
+                        manifests=True, workers=workers):
+        if record.error is not None:
+            continue
+        index.add(tag_info(record.project['name'], record.repository,
+                           record.tag, record.manifest))
+    return index
+
+
+def plan_retention(client, policy, project_pattern=None,
+                   repository_pattern=None, workers=8, now=None):
+    index = collect(client, project_pattern, repository_pattern, workers)
+    return RetentionPlan(client, index, policy.evaluate(index, now))
@@ -0,0 +1,332 @@
+#!/usr/bin/env python
+
+import heapq
+import logging
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+from harborclient.crawler import item_name, name_matches
+from harborclient.models import to_json
+
+logger = logging.getLogger(__name__)
+
+# Names are also indexed by their parts, so "ubu" finds "library/ubuntu"
+# as a prefix of one of its tokens
+_TOKEN = re.compile(r'[a-z0-9]+')
+
+# Longest substrings kept in the gram index, longer terms intersect grams
+_GRAM = 3
+
+_EMPTY = frozenset()
+
+
+class _NameIndex(object):
+    # Substring and token prefix index over a list of names. Built once and
+    # only read afterwards, so it needs no locking.
+    __slots__ = ('names', 'grams', 'tokens', 'postings', 'exact', 'order',
+                 'ranked')
+
+    def __init__(self, names):
+        self.names = [name.lower() for name in names]
+        grams = {}
+        tokens = {}
+        for doc, name in enumerate(self.names):
+            for size in range(1, _GRAM + 1):
+                for start in range(len(name) - size + 1):
+                    grams.setdefault(name[start:start + size], set()).add(doc)
+            for token in set(_TOKEN.findall(name)) | set([name]):
+                tokens.setdefault(token, set()).add(doc)
+        self.grams = grams
+        self.tokens = sorted(tokens)
+        self.postings = [tokens[token] for token in self.tokens]
+        self.exact = dict((name, doc) for doc, name in enumerate(self.names))
+        # Documents from shortest to longest name, the order of equally good
+        # matches, and the position of each document in it
+        self.ranked = sorted(range(len(self.names)),
+                             key=lambda doc: (len(self.names[doc]),
+                                              self.names[doc]))
+        self.order = array('l', [0] * len(self.names))
+        for position, doc in enumerate(self.ranked):
+            self.order[doc] = position
+
+    def substring(self, term):
+        # Candidates containing every gram of the term. For terms longer
+        # than a gram that is a superset, checked by match() only for the
+        # documents it returns. The sets are shared, never change them.
+        if len(term) <= _GRAM:
+            return self.grams.get(term, _EMPTY)
+        postings = sorted((self.grams.get(term[i:i + _GRAM], _EMPTY)
+                           for i in range(len(term) - _GRAM + 1)), key=len)
+        return postings[0].intersection(*postings[1:])
+
+    def prefix(self, term):
+        postings = []
+        for index in range(bisect_left(self.tokens, term), len(self.tokens)):
+            if not self.tokens[index].startswith(term):
+                break
+            postings.append(self.postings[index])
+        if len(postings) == 1:
+            return postings[0]
+        return set().union(*postings)
+
+    def dense(self, term, prefix):
+        # Whether most documents may match, judged by the smallest posting
+        if prefix:
+            size = len(self.prefix(term))
+        else:
+            size = min(len(self.grams.get(term[i:i + _GRAM], _EMPTY))
+                       for i in range(max(1, len(term) - _GRAM + 1)))
+        return size * 8 >= len(self.names)
+
+    def walk(self, term, prefix, within, limit):
+        # Best `limit` matches of one term found by walking the documents
+        # shortest name first, which stops long before the end when most
+        # documents match. Ranks like match().
+        starting = self.prefix(term)
+        if within is not None:
+            starting = starting & within
+        exact = self.exact.get(term)
+        head = [exact] if exact in starting else []
+        if len(starting) * 8 < len(self.names):
+            head += heapq.nsmallest(limit - len(head),
+                                    starting.difference(head),
+                                    key=self.order.__getitem__)
+        else:
+            for doc in self.ranked:
+                if len(head) >= limit:
+                    break
+                if doc in starting and doc != exact:
+                    head.append(doc)
+        if prefix or len(head) >= limit:
+            return head[:limit]
+        for doc in self.ranked:
+            if (doc not in starting and term in self.names[doc] and
+                    (within is None or doc in within)):
+                head.append(doc)
+                if len(head) == limit:
+                    break
+        return head
+
+    def match(self, terms, prefix=False, within=None, limit=None):
+        # Documents matching every term, best matches first
+        if (len(terms) == 1 and limit is not None and
+                self.dense(terms[0], prefix)):
+            return self.walk(terms[0], prefix, within, limit)
+        docs = within
+        for term in terms:
+            found = self.prefix(term) if prefix else self.substring(term)
+            docs = found if docs is None else docs & found
+            if not docs:
+                return []
+        if docs is None:
+            docs = range(len(self.names))
+        longer = [] if prefix else [term for term in terms
+                                    if len(term) > _GRAM]
+
+        def matches(doc):
+            name = self.names[doc]
+            return all(term in name for term in longer)
+
+        if len(terms) != 1:
+            return self._best(self._multi_term_key(terms), docs, limit,
+                              matches)
+
+        # Exact name first, then names with a part starting with the term,
+        # then the other substring matches, shorter names first in each
+        term = terms[0]
+        exact = self.exact.get(term)
+        starting = docs if prefix else docs & self.prefix(term)
+        groups = [set([exact]) & docs if exact is not None else _EMPTY,
+                  starting.difference([exact]),
+                  docs - starting]
+        result = []
+        for group in groups:
+            if limit is not None and len(result) >= limit:
+                break
+            result.extend(self._best(
+                None, group, None if limit is None else limit - len(result),
+                matches))
+        return result
+
+    def _multi_term_key(self, terms):
+        starts = [self.prefix(term) for term in terms]
+        exact = [self.exact.get(term) for term in terms]
+
+        def key(doc):
+            score = sum(0 if doc == e else 1 if doc in s else 2
+                        for e, s in zip(exact, starts))
+            return score, self.order[doc]
+
+        return key
+
+    def _best(self, key, docs, limit, matches):
+        # key None orders by name length only, which the ranked list has
+        # already, so the best few of a big group are found by walking it
+        if key is None:
+            if limit is not None and len(docs) * 8 >= len(self.ranked):
+                found = []
+                for doc in self.ranked:
+                    if doc in docs and matches(doc):
+                        found.append(doc)
+                        if len(found) == limit:
+                            break
+                return found
+            key = self.order.__getitem__
+        docs = [doc for doc in docs if matches(doc)]
+        if limit is None:
+            return sorted(docs, key=key)
+        return heapq.nsmallest(limit, docs, key=key)
+
+
+class _Snapshot(object):
+    # Everything one refresh crawled, with the indexes over it
+    def __init__(self, projects, repositories, tags):
+        self.projects = projects
+        self.repositories = repositories
+        self.tags = tags
+        self.project_index = _NameIndex([p['name'] for p in projects])
+        self.project_docs = dict((p['name'], doc)
+                                 for doc, p in enumerate(projects))
+        self.repository_index = _NameIndex(
+            [r['repository_name'] for r in repositories])
+        self.tag_index = _NameIndex(['%s:%s' % tag for tag in tags])
+        self.repositories_of = {}
+        for doc, repository in enumerate(repositories):
+            self.repositories_of.setdefault(repository['project_name'],
+                                            set()).add(doc)
+        self.tags_of = {}
+        for doc, (repository, _) in enumerate(tags):
+            self.tags_of.setdefault(repository.split('/')[0],
+                                    set()).add(doc)
+
+
+class SearchIndex(object):
+    """Local search over the crawled projects, repositories and tags.
+
+    search() takes the same query as HarborClient.search and returns the
+    same {'project': [...], 'repository': [...]} shape, answered from
+    memory. Every whitespace separated term has to match, as a substring
+    or with prefix=True as the prefix of a name part, and results come
+    best match first. refresh() crawls the registry again and swaps in the
+    new index at once, so searches never wait. With refresh_interval a
+    background thread refreshes that often.
+    """
+
+    def __init__(self, client, refresh_interval=None, tags=True,
+                 project_pattern=None, workers=8):
+        self.client = client
+        self.refresh_interval = refresh_interval
+        self.tags = tags
+        self.project_pattern = project_pattern
+        self.workers = workers
+        self.refreshed_at = None
+        self._snapshot = _Snapshot([], [], [])
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        # Build the index, then keep refreshing it in the background
+        self.refresh()
+        if self.refresh_interval and self._thread is None:
+            self._thread = threading.Thread(target=self._refresh_loop,
+                                            name='harbor-search-refresh')
+            self._thread.daemon = True
+            self._thread.start()
+        return self
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def refresh(self):
+        # Repositories come from the listings, so those without tags are
+        # found too, and tags are only fetched when they are indexed
+        from concurrent.futures import ThreadPoolExecutor
+
+        projects = dict(
+            (project['name'], project)
+            for project in map(to_json, self.client.iter_projects())
+            if name_matches(project['name'], self.project_pattern))
+        repositories = {}
+        tags = []
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            listed = executor.map(self._list_repositories,
+                                  projects.values())
+            for project, names in zip(list(projects.values()), listed):
+                for name in names:
+                    repositories[name] = {
+                        'repository_name': name,
+                        'project_name': project['name'],
+                        'project_id': project.get('project_id'),
+                        'project_public': project.get('public'),
+                    }
+            if self.tags:
+                names = sorted(repositories)
+                for name, repository_tags in zip(
+                        names, executor.map(self._list_tags, names)):
+                    tags.extend((name, tag) for tag in repository_tags)
+        # Readers keep using the old snapshot until this assignment
+        self._snapshot = _Snapshot(
+            [projects[name] for name in sorted(projects)],
+            [repositories[name] for name in sorted(repositories)], tags)
+        self.refreshed_at = time.time()
+        logger.debug("Search index has %s projects, %s repositories and %s "
+                     "tags", len(projects), len(repositories), len(tags))
+
+    def _list_repositories(self, project):
+        return [item_name(to_json(repository)) for repository in
+                self.client.iter_repositories(project['project_id'])]
+
+    def _list_tags(self, repository):
+        return [item_name(tag) for tag in
+                to_json(self.client.get_repository_tags(repository)) or []]
+
+    def _refresh_loop(self):
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("Fail to refresh search index")
+
+    def search(self, query_string, project=None, prefix=False, limit=None):
+        snapshot = self._snapshot
+        terms = query_string.lower().split()
+        within = None
+        if project is not None:
+            doc = snapshot.project_docs.get(project)
+            within = _EMPTY if doc is None else set([doc])
+        projects = snapshot.project_index.match(terms, prefix, within, limit)
+        if project is not None:
+            within = snapshot.repositories_of.get(project, _EMPTY)
+        repositories = snapshot.repository_index.match(terms, prefix, within,
+                                                       limit)
+        return {'project': [snapshot.projects[doc] for doc in projects],
+                'repository': [snapshot.repositories[doc]
+                               for doc in repositories]}
+
+    def search_tags(self, query_string, project=None, prefix=False,
+                    limit=None):
+        # (repository, tag) pairs whose "repository:tag" matches
+        snapshot = self._snapshot
+        within = None
+        if project is not None:
+            within = snapshot.tags_of.get(project, _EMPTY)
+        docs = snapshot.tag_index.match(query_string.lower().split(), prefix,
+                                        within, limit)
+        return [snapshot.tags[doc] for doc in docs]
+
+    def __len__(self):
+        snapshot = self._snapshot
+        return (len(snapshot.projects) + len(snapshot.repositories) +
+                len(snapshot.tags))
@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+
+import re
+from array import array
+from collections import namedtuple
+
+from harborclient.crawler import crawl
+
+# A blob referenced by several projects or repositories has no owner
+SHARED = -1
+
+# One blob of the index, tags are (repository, tag) pairs referencing it
+LayerInfo = namedtuple('LayerInfo', ['digest', 'size', 'refcount', 'tags'])
+
+# Storage of a project or repository. unique_bytes is only referenced by it
+# and would be freed by deleting it, shared_bytes is also referenced
+# elsewhere, layers counts the distinct blobs it references.
+Usage = namedtuple('Usage', ['unique_bytes', 'shared_bytes', 'layers',
+                             'tags'])
+
+_SHA256 = re.compile(r'^sha256:([0-9a-f]{64})$')
+
+
+def manifest_blobs(manifest):
+    # (digest, size) of the config and layer blobs of a manifest response.
+    # Schema 1 manifests do not record sizes, their layers count as 0.
+    manifest = (manifest or {}).get('manifest') or {}
+    blobs = []
+    config = manifest.get('config')
+    if isinstance(config, dict) and config.get('digest'):
+        blobs.append((config['digest'], config.get('size') or 0))
+    for layer in manifest.get('layers') or ():
+        blobs.append((layer.get('digest'), layer.get('size') or 0))
+    for layer in manifest.get('fsLayers') or ():
+        blobs.append((layer.get('blobSum'), 0))
+    return [blob for blob in blobs if blob[0]]
+
+
+def _key(digest):
+    # sha256 digests are kept as their 32 raw bytes instead of 71 chars
+    match = _SHA256.match(digest)
+    return bytes.fromhex(match.group(1)) if match else digest
+
+
+def _digest(key):
+    if isinstance(key, bytes):
+        return 'sha256:' + key.hex()
+    return key
+
+
+class LayerIndex(object):
+    """Compact digest -> (size, refcount, referencing tags) table.
+
+    Blobs are numbered as they are first seen and their size, reference
+    count and owning project and repository live in typed arrays, so
+    millions of layers cost a few dozen bytes each. References are kept as
+    (blob, tag) pairs in two more arrays and tags as numbers into an
+    interned repository table.
+    """
+
+    def __init__(self):
+        self._blobs = {}
+        self.sizes = array('q')
+        self.refcounts = array('l')
+        self._project_owner = array('l')
+        self._repository_owner = array('l')
+
+        self._projects = []
+        self._project_ids = {}
+        self._repositories = []
+        self._repository_ids = {}
+        self._repository_project = array('l')
+        self._tag_names = []
+        self._tag_repository = array('l')
+
+        self._edge_blob = array('l')
+        self._edge_tag = array('l')
+        self._tags_of = None
+
+    def _id(self, names, ids, name):
+        index = ids.get(name)
+        if index is None:
+            index = ids[name] = len(names)
+            names.append(name)
+        return index
+
+    def add(self, project, repository, tag, blobs):
+        # Record that tag references the (digest, size) blobs
+        project_id = self._id(self._projects, self._project_ids, project)
+        repository_id = self._repository_ids.get(repository)
+        if repository_id is None:
+            repository_id = self._id(self._repositories,
+                                     self._repository_ids, repository)
+            self._repository_project.append(project_id)
+        tag_id = len(self._tag_names)
+        self._tag_names.append(tag)
+        self._tag_repository.append(repository_id)
+
+        seen = set()
+        for digest, size in blobs:
+            key = _key(digest)
+            if key in seen:
+                continue
+            seen.add(key)
+            blob = self._blobs.get(key)
+            if blob is None:
+                blob = self._blobs[key] = len(self.sizes)
+                self.sizes.append(size)
+                self.refcounts.append(0)
+                self._project_owner.append(project_id)
+                self._repository_owner.append(repository_id)
+            else:
+                if self._project_owner[blob] != project_id:
+                    self._project_owner[blob] = SHARED
+                if self._repository_owner[blob] != repository_id:
+                    self._repository_owner[blob] = SHARED
+            self.refcounts[blob] += 1
+            self._edge_blob.append(blob)
+            self._edge_tag.append(tag_id)
+        self._tags_of = None
+
+    def get(self, digest):
+        blob = self._blobs.get(_key(digest))
+        if blob is None:
+            return None
+        if self._tags_of is None:
+            # Grouped once after the last add, lookups then stay cheap
+            self._tags_of = {}
+            for edge_blob, edge_tag in zip(self._edge_blob, self._edge_tag):
+                self._tags_of.setdefault(edge_blob, []).append(edge_tag)
+        tags = [(self._repositories[self._tag_repository[tag]],
+                 self._tag_names[tag]) for tag in self._tags_of.get(blob, ())]
+        return LayerInfo(digest, self.sizes[blob], self.refcounts[blob], tags)
+
+    def __len__(self):
+        return len(self.sizes)
+
+    def __iter__(self):
+        # Digests in the order they were first seen
+        for key in self._blobs:
+            yield _digest(key)
+
+    def report(self):
+        return StorageReport(self)
+
+
+class StorageReport(object):
+    """Byte level usage of a LayerIndex.
+
+    total_bytes counts every blob once, as the registry stores it, and
+    logical_bytes counts it once per referencing tag, as pulling every tag
+    would transfer it. projects and repositories map names to Usage.
+    """
+
+    def __init__(self, index):
+        self.total_bytes = sum(index.sizes)
+        self.logical_bytes = sum(
+            index.sizes[blob] for blob in index._edge_blob)
+        self.layers = len(index)
+        self.shared_layers = sum(1 for owner in index._project_owner
+                                 if owner == SHARED)
+
+        tag_project = array('l', (index._repository_project[repository]
+                                  for repository in index._tag_repository))
+        self.projects = self._usage(index, index._projects,
+                                    index._project_owner, tag_project)
+        self.repositories = self._usage(index, index._repositories,
+                                        index._repository_owner,
+                                        index._tag_repository)
+
+    @staticmethod
+    def _usage(index, names, owners, tag_owner):
+        unique = [0] * len(names)
+        shared = [0] * len(names)
+        layers = [0] * len(names)
+        tags = [0] * len(names)
+        for owner in tag_owner:
+            tags[owner] += 1
+        # A blob counts once per owner however many of its tags use it
+        seen = set()
+        for blob, tag in zip(index._edge_blob, index._edge_tag):
+            owner = tag_owner[tag]
+            if (owner, blob) in seen:
+                continue
+            seen.add((owner, blob))
+            layers[owner] += 1
+            if owners[blob] == owner:
+                unique[owner] += index.sizes[blob]
+            else:
+                shared[owner] += index.sizes[blob]
+        return dict((name, Usage(unique[i], shared[i], layers[i], tags[i]))
+                    for i, name in enumerate(names))
+
+    def freed_by_deleting(self, project=None, repository=None):
+        # Bytes garbage collection would free after deleting the project
+        # or repository
+        if repository is not None:
+            return self.repositories[repository].unique_bytes
+        return self.projects[project].unique_bytes
+
+
+def analyze(client, project_pattern=None, repository_pattern=None,
+            workers=8):
+    # Fetch every manifest concurrently into a LayerIndex
+    index = LayerIndex()
+    for record in crawl(client, project_pattern, repository_pattern,
+                        manifests=True, workers=workers):
+        if record.error is not None:
+            continue
+        index.add(record.project['name'], record.repository, record.tag,
+                  manifest_blobs(record.manifest))
+    return index
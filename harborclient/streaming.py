@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+
+import codecs
+import json
+
+# Bytes read from the socket at a time when streaming a response
+CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = ' \t\n\r'
+_NUMBER = '0123456789+-.eE'
+
+# Longest start of a value which still fails to parse, "-Infinit"
+_PARTIAL = 8
+
+
+def iter_json_array(chunks, encoding='utf-8'):
+    """Yield the items of a top level JSON array from chunks of bytes.
+
+    Only the unparsed tail of the document is buffered, so memory is bounded
+    by the largest single item instead of the whole body.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder(encoding)()
+    buffer = ''
+    pos = 0
+    started = False
+    expect_item = True
+    after_comma = False
+
+    for chunk in chunks:
+        buffer = buffer[pos:] + text_decoder.decode(chunk)
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos == len(buffer):
+                break
+
+            char = buffer[pos]
+            if not started:
+                if char != '[':
+                    raise ValueError("Expect a JSON array, got {!r}".format(
+                        buffer[pos:pos + 20]))
+                started = True
+                pos += 1
+                continue
+            if char == ']':
+                if after_comma:
+                    raise ValueError("Trailing comma in JSON array")
+                return
+            if char == ',' and not expect_item:
+                expect_item = True
+                after_comma = True
+                pos += 1
+                continue
+
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as e:
+                # Data cut by the end of the chunk only fails within its
+                # last few characters or as an unterminated string, wait
+                # for more of it. Anything else is invalid, so a bad item
+                # does not buffer the rest of the body.
+                if (e.msg.startswith('Unterminated string') or
+                        len(buffer) - e.pos <= _PARTIAL):
+                    break
+                raise ValueError("Invalid JSON array near {!r}".format(
+                    buffer[pos:e.pos + 20]))
+            # An item is complete once a separator follows it. A number cut
+            # by the end of the chunk (e.g. "3." of "3.5") parses as a
+            # shorter one, so wait for more data before trusting it.
+            after = end
+            while after < len(buffer) and buffer[after] in _WHITESPACE:
+                after += 1
+            if after == len(buffer):
+                break
+            if buffer[after] not in ',]':
+                if after == end and all(c in _NUMBER for c in buffer[end:]):
+                    break
+                raise ValueError("Invalid JSON array near {!r}".format(
+                    buffer[pos:after + 20]))
+            yield item
+            pos = end
+            expect_item = False
+            after_comma = False
+
+    # The closing bracket never arrived
+    raise ValueError("Truncated JSON array")
+
+
+def iter_response_items(response, chunk_size=CHUNK_SIZE):
+    # Parse a streamed requests response and release the connection after
+    try:
+        for item in iter_json_array(response.iter_content(chunk_size)):
+            yield item
+    finally:
+        response.close()
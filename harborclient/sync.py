@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+
+import logging
+import threading
+import time
+from collections import namedtuple
+
+from harborclient.crawler import crawl
+from harborclient.exceptions import HarborError
+from harborclient.models import parse_time, to_json
+
+logger = logging.getLogger(__name__)
+
+# One audit log operation applied to the inventory. time is a unix
+# timestamp, tag is None when a whole repository or project went away.
+Change = namedtuple('Change', ['log_id', 'time', 'operation', 'project',
+                               'repository', 'tag'])
+
+# Operations that change the inventory, pulls are ignored
+OPERATIONS = ('create', 'push', 'delete')
+
+# Tag harbor logs for operations on a whole repository or project
+_NO_TAG = ('', 'N/A', None)
+
+
+def _split(repo_name):
+    # Project name and repository name of an audit log entry. Project
+    # operations log the project name, sometimes with a trailing slash.
+    project, _, rest = repo_name.partition('/')
+    return project, repo_name if rest else None
+
+
+class Inventory(object):
+    """Local index of the projects, repositories and tags of a registry.
+
+    Maps project names to their JSON and repository names to a dict of
+    tag names to manifests, None unless manifests are synced. All methods
+    are safe to call while a Sync applies changes from another thread.
+    """
+
+    def __init__(self):
+        self.projects = {}
+        self.repositories = {}
+        self._lock = threading.Lock()
+
+    def add_project(self, name, project=None):
+        with self._lock:
+            self.projects.setdefault(name, project or {'name': name})
+
+    def add_tag(self, project, repository, tag, manifest=None):
+        with self._lock:
+            self.projects.setdefault(project, {'name': project})
+            self.repositories.setdefault(repository, {})[tag] = manifest
+
+    def remove_tag(self, repository, tag):
+        with self._lock:
+            tags = self.repositories.get(repository)
+            if tags is None:
+                return
+            tags.pop(tag, None)
+            if not tags:
+                del self.repositories[repository]
+
+    def remove_repository(self, repository):
+        with self._lock:
+            self.repositories.pop(repository, None)
+
+    def remove_project(self, project):
+        prefix = project + '/'
+        with self._lock:
+            self.projects.pop(project, None)
+            for repository in [r for r in self.repositories
+                               if r.startswith(prefix)]:
+                del self.repositories[repository]
+
+    def tags(self, repository):
+        with self._lock:
+            return sorted(self.repositories.get(repository, {}))
+
+    def manifest(self, repository, tag):
+        with self._lock:
+            return self.repositories.get(repository, {}).get(tag)
+
+    def snapshot(self):
+        # Copy of {repository: [tags]} for readers iterating at leisure
+        with self._lock:
+            return dict((repository, sorted(tags))
+                        for repository, tags in self.repositories.items())
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(tags) for tags in self.repositories.values())
+
+
+class Sync(object):
+    """Keeps an Inventory up to date from the audit log.
+
+    bootstrap() crawls the registry once, then each poll() reads only the
+    operations logged since the high-water mark, `window` seconds of log
+    per request, and applies pushes and deletes to the inventory. The mark
+    is the time of the last window read, lagging `lag` seconds behind the
+    clock so late log writes are not skipped, plus the ids of the entries
+    already seen at that second, since the log filters by whole seconds.
+    """
+
+    def __init__(self, client, inventory=None, since=None, window=3600,
+                 lag=1, manifests=False, workers=8):
+        self.client = client
+        self.inventory = Inventory() if inventory is None else inventory
+        self.mark = since
+        self.window = window
+        self.lag = lag
+        self.manifests = manifests
+        self.workers = workers
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def bootstrap(self, now=None):
+        # The mark is taken before crawling, operations logged meanwhile
+        # are replayed by the next poll and applying them twice is harmless
+        with self._lock:
+            self.mark = (time.time() if now is None else now) - self.lag
+            self._seen = {}
+            for project in map(to_json, self.client.iter_projects()):
+                self.inventory.add_project(project['name'], project)
+            for record in crawl(self.client, manifests=self.manifests,
+                                workers=self.workers):
+                if record.error is not None:
+                    continue
+                self.inventory.add_tag(record.project['name'],
+                                       record.repository, record.tag,
+                                       record.manifest)
+        return self.inventory
+
+    def poll(self, now=None):
+        """Apply the operations logged since the mark, returning them."""
+        with self._lock:
+            if self.mark is None:
+                raise ValueError("Sync needs bootstrap() or since before "
+                                 "poll()")
+            end_of_log = (time.time() if now is None else now) - self.lag
+            changes = []
+            while self.mark < end_of_log:
+                end = min(self.mark + self.window, end_of_log)
+                entries = self._read(self.mark, end)
+                for entry in entries:
+                    change = self._apply(entry)
+                    if change is not None:
+                        changes.append(change)
+                self._advance(end, entries)
+            logger.debug("Sync applied %s changes up to %s", len(changes),
+                         self.mark)
+            return changes
+
+    def watch(self, interval=60, stop=None):
+        # Poll every interval seconds until the stop event is set, yielding
+        # each change as it is applied
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            for change in self.poll():
+                yield change
+            stop.wait(interval)
+
+    def _read(self, start, end):
+        # Entries of the window in log order, minus the ones already applied
+        # by the previous window sharing its first second
+        entries = []
+        for entry in self.client.iter_logs(start_time=int(start),
+                                           end_time=int(end)):
+            raw = to_json(entry)
+            if raw.get('log_id') not in self._seen:
+                entries.append(raw)
+        response = self.client.last_response
+        if response is None or response.status_code != 200:
+            # Moving the mark past a window that was not read would lose
+            # its operations for good
+            raise HarborError("Fail to read audit log from %s to %s" %
+                              (int(start), int(end)))
+        entries.sort(key=lambda raw: (parse_time(raw.get('op_time')) or 0,
+                                      raw.get('log_id') or 0))
+        return entries
+
+    def _advance(self, end, entries):
+        # The next window starts at the last whole second read, which it
+        # reads again, so remember the entries of that second
+        second = int(end)
+        for raw in entries:
+            self._seen[raw.get('log_id')] = parse_time(
+                raw.get('op_time')) or 0
+        self._seen = dict((log_id, op_time)
+                          for log_id, op_time in self._seen.items()
+                          if op_time >= second)
+        self.mark = end
+
+    def _apply(self, raw):
+        operation = raw.get('operation')
+        if operation not in OPERATIONS:
+            return None
+        project, repository = _split(raw.get('repo_name') or '')
+        tag = raw.get('repo_tag')
+        tag = None if tag in _NO_TAG else tag
+
+        inventory = self.inventory
+        if operation == 'create':
+            inventory.add_project(project)
+        elif operation == 'push' and repository and tag:
+            manifest = None
+            if self.manifests:
+                manifest = self.client.get_repository_manifests(repository,
+                                                                tag)
+                manifest = to_json(manifest)
+            inventory.add_tag(project, repository, tag, manifest)
+        elif operation == 'delete' and repository and tag:
+            inventory.remove_tag(repository, tag)
+        elif operation == 'delete' and repository:
+            inventory.remove_repository(repository)
+        elif operation == 'delete':
+            inventory.remove_project(project)
+        else:
+            return None
+        return Change(raw.get('log_id'), parse_time(raw.get('op_time')),
+                      operation, project, repository, tag)
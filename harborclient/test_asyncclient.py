@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+
+import asyncio
+
+from harborclient.asyncclient import ASYNC_METHODS, AsyncHarborClient
+from harborclient.fakeharbor import FakeHarbor
+from harborclient.harborclient import HarborClient
+
+
+def test_mirrors_public_methods():
+    skipped = set([
+        # Not API calls: session and adapter factories, the async client's
+        # own close() and the per-thread response, which says nothing across
+        # its pool
+        'create_session', 'create_adapter', 'close', 'last_response',
+        # Iterator style, consumed item by item rather than awaited once
+        'crawl',
+        # Run a whole crawl on their own worker pool and return objects
+        # whose later calls block, run them in an executor instead
+        'plan_retention', 'analyze_storage',
+    ])
+    public = set(name for name in dir(HarborClient)
+                 if not name.startswith(('_', 'iter_')) and
+                 name not in skipped)
+    assert public <= set(ASYNC_METHODS)
+
+
+def test_concurrent_calls():
+    async def run(host, user, password):
+        async with AsyncHarborClient(host, user, password,
+                                     concurrency=4) as client:
+            repos = await client.get_repositories(1)
+            tags = await asyncio.gather(
+                *[client.get_repository_tags(repo) for repo in repos])
+            manifests = await asyncio.gather(
+                *[client.get_repository_manifests(repo, tag)
+                  for repo, repo_tags in zip(repos, tags)
+                  for tag in repo_tags])
+            return tags, manifests
+
+    with FakeHarbor(repositories=5, tags=10) as harbor:
+        tags, manifests = asyncio.run(run(harbor.host, harbor.user,
+                                          harbor.password))
+    assert len(tags) == 5
+    assert len(manifests) == 50
+    assert all(m['manifest']['schemaVersion'] == 2 for m in manifests)
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+
+import time
+
+from harborclient.exceptions import CircuitOpenError
+from harborclient.fakeharbor import FakeHarbor
+from harborclient.harborclient import HarborClient
+from harborclient.ratelimit import TokenBucket
+from harborclient.resilience import CircuitBreaker
+
+
+def test_bulk_delete_repositories():
+    with FakeHarbor(projects=1, repositories=20, tags=1) as harbor:
+        client = HarborClient(harbor.host, harbor.user, harbor.password)
+        names = ['project0/repo%d' % i for i in range(20)] + ['missing/repo']
+        results = client.bulk_delete_repositories(names, workers=4)
+        assert [r.item for r in results] == names
+        assert all(r.ok and r.status_code == 200 for r in results[:20])
+        assert not results[-1].ok
+        assert results[-1].status_code == 404
+        assert '404' in results[-1].error
+        assert all(r.latency >= 0 for r in results)
+        assert client.get_repositories(1) == []
+
+
+def test_bulk_create_projects_with_rate_limit():
+    with FakeHarbor(projects=0) as harbor:
+        client = HarborClient(harbor.host, harbor.user, harbor.password)
+        start = time.time()
+        results = client.bulk_create_projects(
+            (('bulk%d' % i, i % 2 == 0) for i in range(6)), workers=3,
+            rate=20)
+        elapsed = time.time() - start
+        assert all(r.ok and r.status_code == 201 for r in results)
+        assert len(client.get_projects()) == 6
+        assert len(client.get_projects(is_public=True)) == 3
+        assert elapsed < 2
+
+
+def test_bulk_reports_exceptions():
+    with FakeHarbor() as harbor:
+        client = HarborClient(harbor.host, harbor.user, harbor.password)
+    # Nothing listens on port 1
+    client.host = '127.0.0.1:1'
+    results = client.bulk('get_statistics', [(), ()], workers=2)
+    assert not any(r.ok for r in results)
+    assert all(r.error is not None for r in results)
+
+
+def test_token_bucket():
+    bucket = TokenBucket(50, burst=1)
+    start = time.time()
+    for _ in range(6):
+        bucket.acquire()
+    assert time.time() - start >= 0.09
+
+
+def test_bulk_does_not_report_stale_status():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    with FakeHarbor(projects=1, repositories=3, tags=1) as harbor:
+        client = HarborClient(harbor.host, harbor.user, harbor.password,
+                              retry=None, circuit_breaker=breaker)
+        client.login()
+        harbor.inject('/api/repositories/tags', 500)
+        results = client.bulk('get_repository_tags',
+                              ['project0/repo0', 'project0/repo1',
+                               'project0/repo2'], workers=1)
+    # The open circuit stops the later items before they are sent
+    assert [r.status_code for r in results] == [500, None, None]
+    assert isinstance(results[2].error, CircuitOpenError)
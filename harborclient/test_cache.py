@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+
+import multiprocessing
+import time
+
+from harborclient.cache import (DiskCache, MISSING, ResponseCache,
+                                ValidatorCache)
+from harborclient.fakeharbor import FakeHarbor
+from harborclient.harborclient import HarborClient
+
+
+def test_lru_eviction():
+    cache = ResponseCache(maxsize=2)
+    cache.set(('h', 'get_projects', (1, )), 1)
+    cache.set(('h', 'get_projects', (2, )), 2)
+    assert cache.get(('h', 'get_projects', (1, ))) == 1
+    cache.set(('h', 'get_projects', (3, )), 3)
+    assert cache.get(('h', 'get_projects', (2, ))) is MISSING
+    assert cache.get(('h', 'get_projects', (1, ))) == 1
+    assert cache.evictions == 1
+
+
+def test_ttl_expiry():
+    cache = ResponseCache(ttls={'get_users': 0.05, 'get_statistics': 0})
+    cache.set(('h', 'get_users', ()), ['admin'])
+    cache.set(('h', 'get_statistics', ()), {})
+    assert cache.get(('h', 'get_users', ())) == ['admin']
+    assert cache.get(('h', 'get_statistics', ())) is MISSING
+    time.sleep(0.1)
+    assert cache.get(('h', 'get_users', ())) is MISSING
+    assert cache.stats()['endpoints']['get_users'] == {'hits': 1,
+                                                       'misses': 1}
+
+
+def test_client_cache_and_invalidation():
+    with FakeHarbor() as harbor:
+        cache = ResponseCache()
+        client = HarborClient(harbor.host, harbor.user, harbor.password,
+                              cache=cache)
+        for _ in range(10):
+            assert client.get_project_id_from_name('project1') == 2
+            client.get_repository_tags('project0/repo0')
+        assert harbor.path_counts['/api/projects'] == 1
+        assert harbor.path_counts['/api/repositories/tags'] == 1
+        assert cache.hits == 18
+
+        assert client.get_repositories(1) == ['project0/repo0',
+                                              'project0/repo1']
+        assert client.delete_repository('project0/repo0')
+        assert client.get_repositories(1) == ['project0/repo1']
+        assert harbor.path_counts['/api/repositories'] == 3
+
+        assert client.create_project('project2')
+        assert client.get_project_id_from_name('project2') == 3
+
+
+def test_conditional_requests():
+    with FakeHarbor() as harbor:
+        validators = ValidatorCache()
+        client = HarborClient(harbor.host, harbor.user, harbor.password,
+                              validators=validators)
+        first = client.get_repository_manifests('project0/repo0', 'v0')
+        for _ in range(3):
+            assert client.get_repository_manifests('project0/repo0',
+                                                   'v0') is first
+            assert client.get_repository_tags('project0/repo0') == ['v0',
+                                                                   'v1',
+                                                                   'v2']
+        assert harbor.not_modified_count == 5
+        assert validators.hits == 5
+
+        harbor.add_tag(1, 'project0/repo0', 'v3')
+        assert client.get_repository_tags('project0/repo0')[-1] == 'v3'
+        assert harbor.not_modified_count == 5
+
+
+def _fill_disk_cache(path, worker):
+    cache = DiskCache(path)
+    for i in range(50):
+        cache.set(('h', 'get_repository_tags', ('repo%d' % i, )),
+                  ['v%d' % worker])
+
+
+def test_disk_cache_shared_between_processes(tmp_path):
+    path = str(tmp_path / 'harbor.db')
+    DiskCache(path)
+    processes = [multiprocessing.Process(target=_fill_disk_cache,
+                                         args=(path, i)) for i in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+    cache = DiskCache(path)
+    assert len(cache) == 50
+    assert cache.get(('h', 'get_repository_tags', ('repo7', )))[0] in [
+        'v0', 'v1', 'v2', 'v3']
+    cache.invalidate('h', ['get_repository_tags'])
+    assert cache.get(('h', 'get_repository_tags', ('repo7', ))) is MISSING
+
+
+def test_disk_cache_size_cap_and_client(tmp_path):
+    path = str(tmp_path / 'harbor.db')
+    cache = DiskCache(path, maxsize=10)
+    for i in range(30):
+        cache.set(('h', 'get_projects', (i, )), i)
+    cache.prune()
+    assert len(cache) == 10
+    assert cache.get(('h', 'get_projects', (29, ))) == 29
+
+    with FakeHarbor() as harbor:
+        for _ in range(3):
+            client = HarborClient(harbor.host, harbor.user, harbor.password,
+                                  cache=DiskCache(path))
+            assert client.get_project_id_from_name('project1') == 2
+        assert harbor.path_counts['/api/projects'] == 1
+
+
+def test_cache_is_not_shared_between_users(tmp_path):
+    cache = DiskCache(str(tmp_path / 'cache.db'))
+    with FakeHarbor() as harbor:
+        admin = HarborClient(harbor.host, harbor.user, harbor.password,
+                             cache=cache)
+        admin.get_projects()
+        guest = HarborClient(harbor.host, 'guest', 'secret', cache=cache,
+                             session_id=admin.session_id)
+        guest.get_projects()
+        admin.get_projects()
+        assert harbor.path_counts['/api/projects'] == 2
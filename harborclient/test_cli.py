@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+
+import io
+import json
+import subprocess
+import sys
+
+from harborclient import cli
+from harborclient.cli import main
+from harborclient.fakeharbor import FakeHarbor
+
+
+def run(harbor, argv, stdin=''):
+    stdout = io.StringIO()
+    stderr = io.StringIO()
+    code = main(argv + ['--host', harbor.host, '--user', harbor.user,
+                        '--password', harbor.password],
+                stdin=io.StringIO(stdin), stdout=stdout, stderr=stderr)
+    lines = [json.loads(line) for line in stdout.getvalue().splitlines()]
+    return code, lines, stderr.getvalue()
+
+
+def test_single_call():
+    with FakeHarbor() as harbor:
+        assert run(harbor, ['get-repositories', '1']) == (
+            0, [['project0/repo0', 'project0/repo1']], '')
+        code, lines, _ = run(harbor, ['iter-projects', '--page-size', '1'])
+        assert code == 0
+        assert [project['name'] for project in lines] == ['project0',
+                                                          'project1']
+        code, lines, error = run(harbor, ['get-repositories'])
+        assert code == 1
+        assert 'project_id' in error
+
+
+def test_batch_keeps_input_order():
+    stdin = '\n'.join([
+        'project0/repo0',
+        '# comment',
+        '["project0/repo1"]',
+        '{"repo_name": "project1/repo0"}',
+        'project1/missing',
+    ])
+    with FakeHarbor() as harbor:
+        code, lines, _ = run(harbor, ['get-repository-tags', '--input', '-',
+                                      '--parallel', '4'], stdin)
+    assert code == 1
+    assert [line['input'] for line in lines] == [
+        ['project0/repo0'], ['project0/repo1'],
+        {'repo_name': 'project1/repo0'}, ['project1/missing']]
+    assert [line['ok'] for line in lines] == [True, True, True, False]
+    assert lines[0]['result'] == ['v0', 'v1', 'v2']
+    assert lines[3]['status_code'] == 404
+
+
+def test_batch_shares_base_arguments():
+    harbor = FakeHarbor(projects=1, repositories=1, tags=3)
+    with harbor:
+        code, lines, _ = run(harbor, ['delete-repository', 'project0/repo0',
+                                      '--input', '-', '--parallel', '2'],
+                             'v0\nv1\n')
+    assert code == 0
+    assert sorted(harbor.repositories['project0/repo0']['tags']) == ['v2']
+
+
+def test_login_session_is_reused():
+    with FakeHarbor() as harbor:
+        code, lines, _ = run(harbor, ['login'])
+        assert code == 0
+        session_id = lines[0]['session_id']
+        code, lines, _ = run(harbor, ['get-statistics', '--session-id',
+                                      session_id])
+        assert code == 0
+        assert lines[0]['total_project_count'] == 2
+        assert harbor.login_count == 1
+        assert session_id in harbor.sessions
+
+
+def test_pool_sized_for_call_workers(monkeypatch):
+    sizes = []
+
+    class Client(cli.HarborClient):
+        def __init__(self, *args, **kwargs):
+            sizes.append(kwargs['threads'])
+            super(Client, self).__init__(*args, **kwargs)
+
+    monkeypatch.setattr(cli, 'HarborClient', Client)
+    with FakeHarbor() as harbor:
+        assert run(harbor, ['crawl', '--workers', '6'])[0] == 0
+        assert run(harbor, ['crawl'])[0] == 0
+        assert run(harbor, ['get-statistics', '--parallel', '3'])[0] == 0
+    assert sizes == [6, 8, 3]
+
+
+def test_parser_does_not_import_inspect():
+    code = ('import sys, harborclient.cli as cli; '
+            'cli.build_parser().parse_args(["crawl", "--host", "h"]); '
+            'cli._bind("get_repository_tags", ["library/ubuntu"], {}); '
+            'assert "inspect" not in sys.modules')
+    subprocess.check_call([sys.executable, '-c', code])
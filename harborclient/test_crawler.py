@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+
+from harborclient.fakeharbor import FakeHarbor
+from harborclient.harborclient import HarborClient
+
+
+def test_crawl_everything():
+    with FakeHarbor(projects=3, repositories=4, tags=5) as harbor:
+        client = HarborClient(harbor.host, harbor.user, harbor.password)
+        records = list(client.crawl(workers=4))
+    assert len(records) == 3 * 4 * 5
+    assert len(set((r.repository, r.tag) for r in records)) == 60
+    assert all(r.manifest['manifest']['schemaVersion'] == 2 for r in records)
+
+
+def test_crawl_patterns_without_manifests():
+    with FakeHarbor(projects=3, repositories=4, tags=5) as harbor:
+        client = HarborClient(harbor.host, harbor.user, harbor.password)
+        records = list(client.crawl(project_pattern='project1',
+                                    repository_pattern=['*/repo0', '*/repo3'],
+                                    manifests=False))
+        manifest_calls = harbor.path_counts.get('/api/repositories/manifests')
+    assert sorted(set(r.repository for r in records)) == [
+        'project1/repo0', 'project1/repo3']
+    assert len(records) == 10
+    assert all(r.manifest is None for r in records)
+    assert manifest_calls is None
+
+
+def test_crawl_stops_early():
+    with FakeHarbor(projects=2, repositories=10, tags=10) as harbor:
+        client = HarborClient(harbor.host, harbor.user, harbor.password)
+        crawler = client.crawl(workers=2)
+        first = next(crawler)
+        crawler.close()
+        manifest_calls = harbor.path_counts['/api/repositories/manifests']
+    assert first.manifest is not None
+    assert manifest_calls < 200
+
+
+def test_crawl_follows_pages():
+    # Harbor pages listings by default, the last pages must be crawled too
+    with FakeHarbor(projects=105, repositories=0) as harbor:
+        for i in range(103):
+            harbor.add_tag(105, 'project104/repo%d' % i, 'latest')
+        client = HarborClient(harbor.host, harbor.user, harbor.password)
+        records = list(client.crawl(manifests=False))
+    assert len(records) == 103
+    assert all(r.project['name'] == 'project104' for r in records)
+
+
+def test_crawl_records_failures():
+    with FakeHarbor(projects=1, repositories=2, tags=2) as harbor:
+        harbor.inject('/api/repositories/tags', status=500)
+        client = HarborClient(harbor.host, harbor.user, harbor.password,
+                              retry=None)
+        records = list(client.crawl(manifests=False, workers=1))
+    failed = [r for r in records if r.error is not None]
+    assert len(failed) == 1 and failed[0].tag is None
+    assert failed[0].repository in ('project0/repo0', 'project0/repo1')
+    assert len(records) == 3
@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+
+import time
+
+from harborclient.fakeharbor import FakeHarbor
+from harborclient.harborclient import HarborClient
+
+
+def test_data_set_size():
+    harbor = FakeHarbor(projects=3, repositories=4, tags=5)
+    assert len(harbor.projects) == 3
+    assert len(harbor.repositories) == 12
+    assert sum(len(r['tags']) for r in harbor.repositories.values()) == 60
+
+
+def test_latency():
+    with FakeHarbor(latency=0.05) as harbor:
+        with HarborClient(harbor.host, harbor.user, harbor.password) as client:
+            client.login()
+            start = time.time()
+            client.get_statistics()
+            assert time.time() - start >= 0.05
+
+
+def test_error_rate_is_repeatable():
+    def statuses(seed):
+        with FakeHarbor(error_rate=0.5, seed=seed) as harbor:
+            with HarborClient(harbor.host, harbor.user, harbor.password,
+                              retry=None) as client:
+                client.login()
+                codes = []
+                for _ in range(20):
+                    client.get_statistics()
+                    codes.append(client.last_response.status_code)
+                assert harbor.error_count == codes.count(503)
+                return codes
+
+    codes = statuses(7)
+    assert set(codes) == set([200, 503])
+    assert statuses(7) == codes
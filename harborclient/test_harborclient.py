@@ -1,3 +1,173 @@
 #!/usr/bin/env python
 
 import harborclient
+
+import logging
+import subprocess
+import sys
+
+import pytest
+
+from harborclient.fakeharbor import FakeHarbor
+from harborclient.harborclient import HarborClient
+
+
+@pytest.fixture
+def harbor():
+    with FakeHarbor() as fake:
+        yield fake
+
+
+@pytest.fixture
+def client(harbor):
+    with HarborClient(harbor.host, harbor.user, harbor.password) as client:
+        yield client
+
+
+def test_login(client):
+    assert client.login() is not None
+    assert client.session_id is not None
+
+
+def test_read_endpoints(client):
+    assert [p['name'] for p in client.get_projects()] == ['project0',
+                                                          'project1']
+    assert client.get_project_id_from_name('project1') == 2
+    assert client.check_project_exist('project0')
+    assert not client.check_project_exist('missing')
+    assert client.get_repositories(1) == ['project0/repo0', 'project0/repo1']
+    assert client.get_repository_tags('project0/repo0') == ['v0', 'v1', 'v2']
+    manifest = client.get_repository_manifests('project0/repo0', 'v0')
+    assert manifest['manifest']['schemaVersion'] == 2
+    assert client.get_statistics()['total_project_count'] == 2
+    assert client.search('repo1')['repository']
+
+
+def test_write_endpoints(client):
+    assert client.create_project('new-project', True)
+    assert client.check_project_exist('new-project')
+    assert client.set_project_publicity(1, False)
+    assert client.create_user('bob', 'bob@example.com', 'pw', 'Bob', '')
+    assert client.delete_repository('project0/repo0')
+    assert client.get_repositories(1) == ['project0/repo1']
+
+
+def test_calls_share_pooled_connection(harbor):
+    client = HarborClient(harbor.host, harbor.user, harbor.password,
+                          pool_maxsize=2, pool_block=True)
+    adapter = client.session.get_adapter('http://' + harbor.host)
+    assert adapter._pool_maxsize == 2
+    assert adapter._pool_block
+    for _ in range(5):
+        client.get_statistics()
+    assert harbor.connection_count == 1
+
+
+def test_login_is_lazy(harbor):
+    with HarborClient(harbor.host, harbor.user, harbor.password) as client:
+        assert harbor.request_count == 0
+        assert client.session_id is None
+        client.get_statistics()
+        client.get_statistics()
+        assert harbor.login_count == 1
+    assert harbor.path_counts['/logout'] == 1
+
+
+def test_relogin_on_expired_session(harbor, client):
+    client.get_statistics()
+    first_session = client.session_id
+    harbor.expire_sessions()
+    assert client.get_statistics()['total_project_count'] == 2
+    assert harbor.login_count == 2
+    assert client.session_id != first_session
+
+
+def test_bad_credentials(harbor):
+    client = HarborClient(harbor.host, harbor.user, 'wrong')
+    assert client.get_statistics() is None
+    assert client.last_response.status_code == 401
+    assert client.session_id is None
+
+
+def test_import_leaves_logging_alone():
+    code = ('import logging, harborclient.harborclient; '
+            'assert not logging.getLogger().handlers')
+    subprocess.check_call([sys.executable, '-c', code])
+
+
+def test_debug_log_truncates_payload(harbor, client, caplog):
+    for index in range(50):
+        harbor.add_project('bulk-project-%d' % index)
+    with caplog.at_level(logging.DEBUG, logger='harborclient.harborclient'):
+        client.get_projects()
+    message = [r.getMessage() for r in caplog.records
+               if r.getMessage().startswith('Successfully get projects')][0]
+    assert '...' in message
+    assert len(message) < 2000
+
+
+def test_session_id_skips_login(harbor):
+    session_id = HarborClient(harbor.host, harbor.user,
+                              harbor.password).login()
+    with HarborClient(harbor.host, harbor.user, harbor.password,
+                      session_id=session_id) as client:
+        assert client.get_statistics()['total_project_count'] == 2
+    assert harbor.login_count == 1
+    # The session belongs to the caller, close() leaves it logged in
+    assert session_id in harbor.sessions
+
+    harbor.expire_sessions()
+    with HarborClient(harbor.host, harbor.user, harbor.password,
+                      session_id=session_id) as client:
+        assert client.get_statistics()['total_project_count'] == 2
+    assert harbor.login_count == 2
+
+
+def test_session_id_on_dotless_host(harbor):
+    host = 'localhost:%d' % harbor.server.server_address[1]
+    session_id = HarborClient(host, harbor.user, harbor.password).login()
+    with HarborClient(host, harbor.user, harbor.password,
+                      session_id=session_id) as client:
+        assert client.get_statistics()['total_project_count'] == 2
+        assert harbor.login_count == 1
+
+        harbor.expire_sessions()
+        assert client.get_statistics()['total_project_count'] == 2
+        assert harbor.login_count == 2
+        # The new session replaced the given one
+        assert len([cookie for cookie in client.session.cookies
+                    if cookie.name == 'beegosessionID']) == 1
+
+
+def test_shared_adapter_keeps_sessions_apart(harbor):
+    adapter = HarborClient.create_adapter(pool_maxsize=2)
+    first = HarborClient(harbor.host, harbor.user, harbor.password,
+                         adapter=adapter)
+    second = HarborClient(harbor.host, harbor.user, harbor.password,
+                          adapter=adapter)
+    assert first.get_statistics() is not None
+    assert second.get_statistics() is not None
+    assert first.session_id != second.session_id
+    assert first.session.cookies is not second.session.cookies
+
+    first.close()
+    assert second.session_id in harbor.sessions
+    assert second.get_statistics() is not None
+    assert harbor.login_count == 2
+    assert harbor.connection_count == 1
+    second.close()
+
+
+def test_import_defers_heavy_modules():
+    # Cold start of short-lived processes, see benchmarks/bench_startup.py
+    output = subprocess.check_output(
+        [sys.executable, '-X', 'importtime', '-c',
+         'import harborclient.harborclient'], stderr=subprocess.STDOUT,
+        universal_newlines=True)
+    imported = set(line.split('|')[-1].strip()
+                   for line in output.splitlines()
+                   if line.startswith('import time:'))
+    assert 'harborclient.harborclient' in imported
+    for module in ('requests', 'urllib3', 'sqlite3', 'inspect',
+                   'concurrent.futures.thread'):
+        assert module not in imported
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+
+from harborclient.cache import ResponseCache
+from harborclient.fakeharbor import FakeHarbor
+from harborclient.harborclient import HarborClient
+from harborclient.metrics import MetricsCollector, TracingHook
+from harborclient.resilience import RetryPolicy
+
+
+class FakeSpan(object):
+    def __init__(self, name, attributes):
+        self.name = name
+        self.attributes = dict(attributes)
+        self.exceptions = []
+        self.ended = False
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def record_exception(self, exception):
+        self.exceptions.append(exception)
+
+    def end(self):
+        self.ended = True
+
+
+class FakeTracer(object):
+    def __init__(self):
+        self.spans = []
+
+    def start_span(self, name, attributes=None):
+        span = FakeSpan(name, attributes or {})
+        self.spans.append(span)
+        return span
+
+
+def test_metrics_and_tracing():
+    metrics = MetricsCollector()
+    tracer = FakeTracer()
+    with FakeHarbor() as harbor:
+        client = HarborClient(harbor.host, harbor.user, harbor.password,
+                              cache=ResponseCache(),
+                              retry=RetryPolicy(backoff_factor=0.01),
+                              hooks=[metrics, TracingHook(tracer)])
+        harbor.inject('/api/repositories/tags', 503)
+        client.get_repository_tags('project0/repo0')
+        client.get_repository_tags('project0/repo0')
+        client.create_project('traced')
+
+    snapshot = metrics.snapshot()
+    assert snapshot['requests'] == {
+        ('/login', 'POST', '200'): 1,
+        ('/api/repositories/tags', 'GET', '503'): 1,
+        ('/api/repositories/tags', 'GET', '200'): 1,
+        ('/api/projects', 'POST', '201'): 1,
+    }
+    assert snapshot['retries'] == {'/api/repositories/tags': 1}
+    assert snapshot['cache'] == {('get_repository_tags', 'miss'): 1,
+                                 ('get_repository_tags', 'hit'): 1}
+    assert snapshot['bytes_received']['/api/repositories/tags'] > 0
+    assert snapshot['bytes_sent']['/api/projects'] > 0
+    assert snapshot['latencies']['/api/repositories/tags']['count'] == 2
+
+    text = metrics.prometheus()
+    assert ('harbor_client_requests_total{endpoint="/api/projects",'
+            'method="POST",status="201"} 1') in text
+    assert ('harbor_client_request_duration_seconds_bucket{endpoint='
+            '"/api/repositories/tags",le="+Inf"} 2') in text
+
+    assert [span.name for span in tracer.spans] == [
+        'POST /login', 'GET /api/repositories/tags',
+        'GET /api/repositories/tags', 'POST /api/projects']
+    assert all(span.ended for span in tracer.spans)
+    assert tracer.spans[1].attributes['http.status_code'] == 503
+    assert tracer.spans[2].attributes['harbor.attempt'] == 1
+
+
+def test_errors_are_reported():
+    metrics = MetricsCollector()
+    client = HarborClient('127.0.0.1:1', 'admin', 'password', retry=None,
+                          hooks=[metrics])
+    try:
+        client.get_statistics()
+    except Exception:
+        pass
+    assert metrics.snapshot()['requests'] == {('/login', 'POST', 'error'): 1}
+
+
+def test_success_inside_except_block_is_not_an_error():
+    metrics = MetricsCollector()
+    with FakeHarbor() as harbor:
+        client = HarborClient(harbor.host, harbor.user, harbor.password,
+                              hooks=[metrics])
+        client.login()
+        try:
+            {}['missing']
+        except KeyError:
+            client.get_statistics()
+    assert metrics.snapshot()['requests'][
+        ('/api/statistics', 'GET', '200')] == 1
+    assert ('/api/statistics', 'GET', 'error') not in metrics.snapshot()[
+        'requests']
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+
+import tracemalloc
+
+import pytest
+
+from harborclient.cache import ResponseCache
+from harborclient.fakeharbor import FakeHarbor
+from harborclient.harborclient import HarborClient
+from harborclient.models import (TABLE, LogEntry, Manifest, Project,
+                                 Repository, Table, Tag, parse_time, to_json)
+
+
+@pytest.fixture
+def harbor():
+    with FakeHarbor() as fake:
+        yield fake
+
+
+def test_fields_parse_raw_json():
+    raw = {'project_id': 3, 'name': 'library', 'public': 1,
+           'creation_time': '2016-07-27T09:45:31Z', 'extra': 'kept'}
+    project = Project(raw)
+    assert project.project_id == 3
+    assert project.name == 'library'
+    assert project.public is True
+    assert project.creation_time == parse_time('2016-07-27T09:45:31Z')
+    assert project.owner_name is None
+    assert project.raw is raw
+    assert not hasattr(project, '__dict__')
+
+
+def test_plain_name_strings():
+    assert Repository('library/ubuntu').name == 'library/ubuntu'
+    tag = Tag('latest', 'library/ubuntu')
+    assert (tag.repository, tag.name, tag.digest) == ('library/ubuntu',
+                                                     'latest', None)
+    assert tag == Tag('latest', 'library/ubuntu')
+    assert tag != Tag('latest', 'library/debian')
+
+
+def test_client_returns_models(harbor):
+    with HarborClient(harbor.host, harbor.user, harbor.password,
+                      models=True) as client:
+        projects = client.get_projects()
+        assert [p.name for p in projects] == ['project0', 'project1']
+        assert isinstance(projects[0].creation_time, float)
+
+        tags = client.get_repository_tags(repo_name='project0/repo0')
+        assert tags == [Tag(name, 'project0/repo0')
+                        for name in ('v0', 'v1', 'v2')]
+
+        manifest = client.get_repository_manifests('project0/repo0', 'v0')
+        assert isinstance(manifest, Manifest)
+        assert (manifest.repository, manifest.tag) == ('project0/repo0',
+                                                       'v0')
+        assert manifest.schema_version == 2
+        assert manifest.size == 1024 + 2048
+        assert manifest.created is not None
+
+        logs = client.get_logs()
+        assert all(isinstance(log, LogEntry) for log in logs)
+        assert logs[0].operation == 'push'
+
+        assert [p.project_id for p in client.iter_projects(page_size=1)] == [
+            1, 2
+        ]
+        assert client.get_statistics()['total_project_count'] == 2
+
+
+def test_cache_keeps_json(harbor):
+    cache = ResponseCache()
+    with HarborClient(harbor.host, harbor.user, harbor.password, cache=cache,
+                      models=True) as client:
+        client.get_repositories(1)
+        repositories = client.get_repositories(1)
+    assert [r.name for r in repositories] == ['project0/repo0',
+                                              'project0/repo1']
+    assert cache.stats()['hits'] == 1
+    assert all(isinstance(value, list)
+               for _, value in cache._data.values())
+
+
+def test_table_round_trip():
+    table = Table(Tag)
+    table.append(Tag({'name': 'v1', 'digest': 'sha256:a', 'size': 10,
+                      'created': '2016-07-27T09:45:31Z'}, 'library/app'))
+    table.append(Tag('v2', 'library/app'))
+    assert len(table) == 2
+    assert table.column('name') == ['v1', 'v2']
+    assert table.column('size') == [10, None]
+    assert table.column('repository') == ['library/app', 'library/app']
+    first, second = list(table)
+    assert first.created == parse_time('2016-07-27T09:45:31Z')
+    assert second.digest is None and second.created is None
+    assert table[-1].name == 'v2'
+    assert table.to_json()[1] == {'name': 'v2', 'digest': None, 'size': None,
+                                  'created': None}
+    with pytest.raises(IndexError):
+        table[2]
+    with pytest.raises(KeyError):
+        table.column('missing')
+
+
+def test_table_is_smaller_than_dicts():
+    def tags():
+        for index in range(20000):
+            yield {'name': 'v%d' % index,
+                   'digest': None,
+                   'size': index,
+                   'created': 1500000000.0 + index}
+
+    tracemalloc.start()
+    try:
+        as_dicts = list(tags())
+        dict_size = tracemalloc.get_traced_memory()[0]
+        del as_dicts
+        base = tracemalloc.get_traced_memory()[0]
+        table = Table(Tag, (Tag(raw, 'library/app') for raw in tags()))
+        table_size = tracemalloc.get_traced_memory()[0] - base
+    finally:
+        tracemalloc.stop()
+    assert len(table) == 20000
+    assert table_size < dict_size / 2
+
+
+def test_client_returns_tables(harbor):
+    with HarborClient(harbor.host, harbor.user, harbor.password,
+                      models=TABLE) as client:
+        tags = client.get_repository_tags('project0/repo0')
+        assert isinstance(tags, Table)
+        assert tags.column('name') == ['v0', 'v1', 'v2']
+        assert tags.column('repository') == ['project0/repo0'] * 3
+        projects = client.get_projects()
+        assert [p.name for p in projects] == ['project0', 'project1']
+        assert to_json(projects)[0]['project_id'] == 1
+        assert isinstance(client.get_repository_manifests('project0/repo0',
+                                                          'v0'), Manifest)
+        assert len(list(client.crawl(manifests=False))) == 12
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+
+import pytest
+
+from harborclient.fakeharbor import FakeHarbor
+from harborclient.harborclient import HarborClient
+
+
+@pytest.fixture
+def harbor():
+    with FakeHarbor(projects=25, repositories=0) as fake:
+        for i in range(23):
+            fake.add_tag(1, 'project0/repo%02d' % i, 'latest')
+        yield fake
+
+
+@pytest.fixture
+def client(harbor):
+    return HarborClient(harbor.host, harbor.user, harbor.password)
+
+
+@pytest.mark.parametrize('prefetch', [False, True])
+def test_iter_projects_follows_pages(harbor, client, prefetch):
+    names = [p['name'] for p in client.iter_projects(page_size=10,
+                                                     prefetch=prefetch)]
+    assert names == ['project%d' % i for i in range(25)]
+    assert harbor.path_counts['/api/projects'] == 3
+
+
+def test_iter_is_lazy(harbor, client):
+    repositories = client.iter_repositories(1, page_size=5)
+    assert next(repositories) == 'project0/repo00'
+    assert harbor.path_counts['/api/repositories'] == 1
+    assert len(list(repositories)) == 22
+
+
+def test_server_side_filters(client):
+    assert [p['name'] for p in client.iter_projects(is_public=True)] == [
+        'project0']
+    assert [p['name'] for p in client.get_projects('project2')] == [
+        'project2'] + ['project%d' % i for i in range(20, 25)]
+    assert client.get_repositories(1, 'repo1') == [
+        'project0/repo%d' % i for i in range(10, 20)]
+    assert [u['username'] for u in client.iter_users('admin')] == ['admin']
+    assert len(client.get_logs(lines=5)) == 5
+    assert len(list(client.iter_logs(page_size=7))) == 23
+
+
+@pytest.mark.parametrize('stream', [False, True])
+def test_server_ignoring_pages(stream):
+    # Exactly page_size items and no X-Total-Count, page 2 repeats page 1
+    with FakeHarbor(projects=10, paging=False) as harbor:
+        client = HarborClient(harbor.host, harbor.user, harbor.password)
+        names = [p['name'] for p in client.iter_projects(page_size=10,
+                                                         stream=stream)]
+        assert names == ['project%d' % i for i in range(10)]
+        assert harbor.path_counts['/api/projects'] == 2
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+
+import pytest
+
+from harborclient.cache import ResponseCache
+from harborclient.fakeharbor import FakeHarbor
+from harborclient.pool import HarborClientPool
+
+# Nothing listens there, connections are refused right away
+DOWN = '127.0.0.1:1'
+
+
+@pytest.fixture
+def hosts():
+    with FakeHarbor() as primary, FakeHarbor(latency=0.05) as slow, \
+            FakeHarbor() as fast:
+        yield primary, slow, fast
+
+
+def pool_of(primary, replicas, **kwargs):
+    kwargs.setdefault('health_interval', None)
+    return HarborClientPool(primary.host, [getattr(r, 'host', r)
+                                           for r in replicas],
+                            primary.user, primary.password, retry=None,
+                            **kwargs)
+
+
+def test_reads_go_to_fastest_replica(hosts):
+    primary, slow, fast = hosts
+    with pool_of(primary, [slow, fast]) as pool:
+        pool.check_health()
+        assert pool.read_order()[-1].host == slow.host
+        for _ in range(5):
+            assert pool.get_statistics()['total_project_count'] == 2
+        assert (primary.path_counts.get('/api/statistics', 0) +
+                fast.path_counts.get('/api/statistics', 0)) == 5
+        assert '/api/statistics' not in slow.path_counts
+
+
+def test_writes_go_to_primary(hosts):
+    primary, slow, fast = hosts
+    with pool_of(primary, [slow, fast]) as pool:
+        assert pool.create_project('new-project')
+        assert pool.bulk_delete_repositories(['project0/repo0'])[0].ok
+    assert primary.find_project(project_name='new-project')
+    assert not fast.find_project(project_name='new-project')
+    assert 'project0/repo0' in fast.repositories
+
+
+def test_failover_when_replica_down(hosts):
+    primary, slow, fast = hosts
+    with pool_of(primary, [DOWN]) as pool:
+        down = pool.endpoints[1]
+        down.latency = 0.001
+        primary_endpoint = pool.endpoints[0]
+        primary_endpoint.latency = 1
+        assert pool.read_order()[0] is down
+        assert pool.get_projects()
+        assert not down.healthy
+        assert pool.read_order()[0] is primary_endpoint
+        assert [s['healthy'] for s in pool.status()] == [True, False]
+
+
+def test_lagging_replica_falls_back(hosts):
+    primary, slow, fast = hosts
+    primary.add_tag(1, 'project0/new', 'v1')
+    with pool_of(primary, [fast]) as pool:
+        pool.endpoints[0].latency = 1
+        pool.endpoints[1].latency = 0.001
+        assert pool.get_repository_tags('project0/new') == ['v1']
+        assert fast.path_counts['/api/repositories/tags'] == 1
+        assert pool.get_repository_tags('project0/repo0') == ['v0', 'v1', 'v2']
+        assert primary.path_counts['/api/repositories/tags'] == 1
+
+
+def test_health_thread_revives_host(hosts):
+    primary, slow, fast = hosts
+    with pool_of(primary, [fast], health_interval=0.05) as pool:
+        replica = pool.endpoints[1]
+        pool._mark_down(replica, 'test')
+        for _ in range(100):
+            if replica.healthy and replica.latency is not None:
+                break
+            pool._stop.wait(0.02)
+        assert replica.healthy
+        assert fast.path_counts['/api/projects'] >= 1
+
+
+def test_crawl_and_iterators_use_replicas(hosts):
+    primary, slow, fast = hosts
+    with pool_of(primary, [fast]) as pool:
+        pool.endpoints[0].latency = 1
+        pool.endpoints[1].latency = 0.001
+        assert len(list(pool.crawl(manifests=False))) == 12
+        assert [p['name'] for p in pool.iter_projects()] == ['project0',
+                                                             'project1']
+    assert primary.path_counts.get('/api/repositories/tags') is None
+
+
+def test_cache_hit_is_not_judged_by_earlier_response(hosts):
+    primary, slow, fast = hosts
+    with pool_of(primary, [fast], cache=ResponseCache()) as pool:
+        replica = pool.endpoints[1]
+        pool.endpoints[0].latency = 1
+        replica.latency = 0.001
+        assert pool.get_statistics()['total_project_count'] == 2
+        # An unrelated 503 seen by the replica client on this thread
+        fast.inject('/api/logs', 503)
+        replica.client.get_logs()
+        assert pool.get_statistics()['total_project_count'] == 2
+        assert replica.healthy
+        assert '/api/statistics' not in primary.path_counts
+        assert fast.path_counts['/api/statistics'] == 1
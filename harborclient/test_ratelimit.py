@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+
+import threading
+import time
+
+from harborclient.fakeharbor import FakeHarbor
+from harborclient.harborclient import HarborClient
+from harborclient.ratelimit import AdaptiveConcurrency, RateLimiter
+
+
+def test_rate_limiter_per_class_and_host():
+    limiter = RateLimiter(read=1000, write=20, burst=1,
+                          hosts={'slow': {'read': 20}})
+    start = time.time()
+    for _ in range(5):
+        limiter.acquire('fast', 'GET')
+    assert time.time() - start < 0.1
+    for _ in range(5):
+        limiter.acquire('fast', 'DELETE')
+    assert time.time() - start >= 0.19
+    start = time.time()
+    for _ in range(5):
+        limiter.acquire('slow', 'GET')
+    assert time.time() - start >= 0.19
+    assert limiter.bucket('slow', 'write').rate == 20
+    assert not RateLimiter(read=10).bucket('slow', 'write')
+
+
+def test_aimd():
+    limit = AdaptiveConcurrency(initial=4, minimum=1, maximum=6,
+                                latency_target=1)
+    for _ in range(20):
+        limit.acquire()
+        limit.release(time.time(), 0.1)
+    assert limit.limit == 6
+
+    start = time.time()
+    for _ in range(3):
+        limit.acquire()
+    for _ in range(3):
+        limit.release(start, 0.1, failed=True)
+    # Three failures of the same round trip only halve the limit once
+    assert limit.limit == 3
+
+    limit.acquire()
+    limit.release(time.time(), 5)
+    assert limit.limit == 1.5
+
+
+def test_aimd_blocks_above_limit():
+    limit = AdaptiveConcurrency(initial=2)
+    limit.acquire()
+    limit.acquire()
+    acquired = threading.Event()
+
+    def third():
+        limit.acquire()
+        acquired.set()
+
+    threading.Thread(target=third).start()
+    assert not acquired.wait(0.1)
+    limit.release(time.time(), 0.01)
+    assert acquired.wait(1)
+
+
+def test_client_shrinks_concurrency_on_overload():
+    with FakeHarbor() as harbor:
+        limit = AdaptiveConcurrency(initial=8)
+        client = HarborClient(harbor.host, harbor.user, harbor.password,
+                              concurrency_limit=limit,
+                              rate_limiter=RateLimiter(read=500))
+        client.get_statistics()
+        harbor.inject('/api/statistics', 429, count=2)
+        assert client.get_statistics() is not None
+        assert limit.limit < 8
+        assert limit.in_flight == 0
+
+
+def test_client_shrinks_concurrency_on_server_errors():
+    with FakeHarbor() as harbor:
+        limit = AdaptiveConcurrency(initial=8)
+        client = HarborClient(harbor.host, harbor.user, harbor.password,
+                              concurrency_limit=limit, retry=None)
+        client.get_statistics()
+        harbor.inject('/api/statistics', 500)
+        assert client.get_statistics() is None
+        assert limit.limit < 5
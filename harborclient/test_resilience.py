@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+
+import time
+
+import pytest
+import requests
+
+from harborclient.exceptions import CircuitOpenError
+from harborclient.fakeharbor import FakeHarbor
+from harborclient.harborclient import HarborClient
+from harborclient.resilience import (CircuitBreaker, LatencyTracker,
+                                     RetryPolicy, endpoint_of)
+
+
+@pytest.fixture
+def harbor():
+    with FakeHarbor() as fake:
+        yield fake
+
+
+def test_endpoint_of():
+    assert endpoint_of('http://h/api/users/12/password?user_id=12') == \
+        '/api/users/{id}/password'
+    assert endpoint_of('http://h/api/repositories/tags?repo_name=a') == \
+        '/api/repositories/tags'
+
+
+def test_retry_policy():
+    policy = RetryPolicy(total=2, backoff_factor=1, jitter=False)
+    assert policy.should_retry('GET', 0, 503)
+    assert not policy.should_retry('GET', 0, 404)
+    assert not policy.should_retry('POST', 0, 503)
+    assert not policy.should_retry('GET', 2, 503)
+    assert [policy.backoff(n) for n in range(3)] == [1, 2, 4]
+
+
+def test_retries_transient_errors(harbor):
+    client = HarborClient(harbor.host, harbor.user, harbor.password,
+                          retry=RetryPolicy(total=3, backoff_factor=0.01))
+    harbor.inject('/api/statistics', 503, count=2)
+    assert client.get_statistics()['total_project_count'] == 2
+    assert harbor.path_counts['/api/statistics'] == 3
+
+    harbor.inject('/api/projects', 500)
+    assert not client.create_project('never-retried')
+    assert harbor.path_counts['/api/projects'] == 1
+
+
+def test_per_endpoint_retry_and_timeout(harbor):
+    client = HarborClient(harbor.host, harbor.user, harbor.password,
+                          retries={'/api/statistics': None},
+                          timeouts={'/api/logs': (1, 0.1)})
+    harbor.inject('/api/statistics', 503)
+    assert client.get_statistics() is None
+
+    harbor.inject('/api/logs', None, count=3, delay=0.3)
+    with pytest.raises(requests.Timeout):
+        client.get_logs()
+    assert harbor.path_counts['/api/logs'] == 3
+
+
+def test_circuit_breaker(harbor):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.2)
+    client = HarborClient(harbor.host, harbor.user, harbor.password,
+                          retry=None, circuit_breaker=breaker)
+    harbor.inject('/api/statistics', 502, count=2)
+    client.get_statistics()
+    client.get_statistics()
+    with pytest.raises(CircuitOpenError):
+        client.get_statistics()
+    assert harbor.path_counts['/api/statistics'] == 2
+
+    time.sleep(0.25)
+    assert client.get_statistics() is not None
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_latency_tracker():
+    tracker = LatencyTracker(min_timeout=0.5)
+    assert tracker.timeout('/api/logs', 60) == 60
+    for _ in range(50):
+        tracker.observe('/api/logs', 0.2)
+    assert 0.5 <= tracker.timeout('/api/logs', 60) < 1
+    tracker.observe('/api/logs', 100)
+    assert tracker.timeout('/api/logs', 60) == 60
+    assert tracker.timeout('/api/logs', None) > 60
+
+
+def test_adaptive_timeout_without_read_timeout(harbor):
+    # (5, None) means no read timeout, the adaptive one is then unbounded
+    client = HarborClient(harbor.host, harbor.user, harbor.password,
+                          timeout=(5, None), adaptive_timeout=True)
+    for _ in range(3):
+        assert client.get_statistics() is not None
+    connect, read = client._timeout('/api/statistics')
+    assert connect == 5 and read >= client.latency.min_timeout
+
+
+def test_circuit_breaker_settles_failed_trial(harbor):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.2)
+    client = HarborClient(harbor.host, harbor.user, harbor.password,
+                          retry=None, circuit_breaker=breaker)
+    client.login()
+    harbor.inject('/api/statistics', 502)
+    client.get_statistics()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    time.sleep(0.25)
+    send = client._send
+
+    def broken(*args, **kwargs):
+        raise requests.exceptions.ChunkedEncodingError('truncated')
+
+    client._send = broken
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        client.get_statistics()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    client._send = send
+    time.sleep(0.25)
+    assert client.get_statistics() is not None
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_circuit_breaker_retries_unsettled_trial():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.1)
+    breaker.record_failure()
+    time.sleep(0.15)
+    breaker.before_request()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+    time.sleep(0.15)
+    breaker.before_request()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
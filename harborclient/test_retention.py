@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+
+import pytest
+
+from harborclient.fakeharbor import FakeHarbor, _timestamp
+from harborclient.harborclient import HarborClient
+from harborclient.retention import (RetentionPolicy, TagIndex, TagInfo,
+                                    parse_time, plan_retention, tag_info)
+
+
+def test_parse_time():
+    assert parse_time('2017-07-14T02:40:00Z') == 1500000000
+    assert parse_time('2017-07-14T02:40:00.25Z') == 1500000000.25
+    assert parse_time('2017-07-14T02:40:00.123456789+00:00') == pytest.approx(
+        1500000000.123456789)
+    assert parse_time('yesterday') is None
+
+
+def test_policy_rules():
+    index = TagIndex([TagInfo('p', 'p/r', 'v%d' % i, 1000 + i, 'd%d' % i)
+                      for i in range(6)] +
+                     [TagInfo('p', 'p/r', 'latest', 1000, 'd5'),
+                      TagInfo('p', 'p/r', 'undated', None, 'dx')])
+    # "undated" sorts as the newest and "latest" shares its digest with v5
+    deletes = RetentionPolicy(keep_last=2).evaluate(index)
+    assert [d.tag for d in deletes] == ['v4', 'v3', 'v2', 'v1', 'v0']
+
+    deletes = RetentionPolicy(keep_last=1, older_than=3,
+                              keep_tags=['v0']).evaluate(index, now=1005)
+    assert [d.tag for d in deletes] == ['v2', 'v1']
+
+    with pytest.raises(ValueError):
+        RetentionPolicy()
+
+
+def test_plan_and_execute():
+    with FakeHarbor(projects=2, repositories=2, tags=5) as harbor:
+        harbor.add_tag(1, 'project0/repo0', 'stable',
+                       digest=harbor.repositories['project0/repo0']['tags']
+                       ['v0']['digest'])
+        client = HarborClient(harbor.host, harbor.user, harbor.password)
+        plan = client.plan_retention(RetentionPolicy(keep_last=2),
+                                     project_pattern='project0')
+        # v0 shares its manifest with the kept "stable" tag
+        assert sorted((d.repository, d.tag) for d in plan) == [
+            ('project0/repo0', 'v1'), ('project0/repo0', 'v2'),
+            ('project0/repo0', 'v3'), ('project0/repo1', 'v0'),
+            ('project0/repo1', 'v1'), ('project0/repo1', 'v2')]
+        assert plan.summary()['keep'] == 5
+        assert len(harbor.repositories['project0/repo0']['tags']) == 6
+
+        results = plan.execute(workers=2)
+        assert all(r.ok for r in results)
+        assert client.get_repository_tags('project0/repo0') == ['stable',
+                                                                'v0', 'v4']
+        assert client.get_repository_tags('project1/repo0') == [
+            'v0', 'v1', 'v2', 'v3', 'v4']
+
+
+def test_older_than_uses_manifest_creation_time():
+    with FakeHarbor(projects=1, repositories=1, tags=4) as harbor:
+        client = HarborClient(harbor.host, harbor.user, harbor.password)
+        now = _timestamp('2017-07-14T02:40:02Z')
+        plan = plan_retention(client, RetentionPolicy(older_than=1), now=now)
+        assert sorted(d.tag for d in plan) == ['v0', 'v1']
+
+
+def test_manifest_without_digest_is_not_given_one():
+    manifest = {'manifest': {'schemaVersion': 2, 'layers': []},
+                'config': '{"created": "2017-07-14T02:40:00Z"}'}
+    old = tag_info('p', 'p/r', 'old', manifest)
+    assert old.digest is None
+    assert old.created == 1500000000
+    assert old.manifest_key == tag_info('p', 'p/r', 'new',
+                                        manifest).manifest_key
+
+    index = TagIndex([old, TagInfo('p', 'p/r', 'new', 1500000001, None,
+                                   old.manifest_key)])
+    # old shares its manifest with the kept new tag
+    assert RetentionPolicy(keep_last=1).evaluate(index) == []
+    index.add(TagInfo('p', 'p/r', 'other', 1, None, 'other-manifest'))
+    deletes = RetentionPolicy(keep_last=1).evaluate(index)
+    assert [(d.tag, d.digest) for d in deletes] == [('other', None)]
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+
+import time
+
+import pytest
+
+from harborclient.fakeharbor import FakeHarbor
+from harborclient.harborclient import HarborClient
+from harborclient.searchindex import SearchIndex
+
+
+@pytest.fixture
+def harbor():
+    with FakeHarbor() as fake:
+        fake.add_project('library', is_public=True)
+        fake.add_tag(3, 'library/ubuntu', 'xenial')
+        fake.add_tag(3, 'library/ubuntu-debug', 'xenial')
+        fake.add_tag(3, 'library/busybox', 'latest')
+        fake.add_project('empty')
+        yield fake
+
+
+@pytest.fixture
+def client(harbor):
+    with HarborClient(harbor.host, harbor.user, harbor.password) as client:
+        yield client
+
+
+@pytest.fixture
+def index(client):
+    with SearchIndex(client) as index:
+        yield index
+
+
+def names(result):
+    return ([p['name'] for p in result['project']],
+            [r['repository_name'] for r in result['repository']])
+
+
+def test_matches_server_search(client, index):
+    for query in ('repo1', 'project0', 'ubuntu', 'b', 'missing', ''):
+        local = index.search(query)
+        remote = client.search(query)
+        assert sorted(map(str, local['project'])) == sorted(
+            map(str, remote['project']))
+        assert sorted(map(str, local['repository'])) == sorted(
+            map(str, remote['repository']))
+
+
+def test_ranking_and_terms(index):
+    assert names(index.search('ubuntu')) == (
+        [], ['library/ubuntu', 'library/ubuntu-debug'])
+    assert names(index.search('DEBUG ubu')) == ([], ['library/ubuntu-debug'])
+    assert names(index.search('box', prefix=True)) == ([], [])
+    assert names(index.search('busy', prefix=True)) == (
+        [], ['library/busybox'])
+    assert names(index.search('repo', project='project1')) == (
+        [], ['project1/repo0', 'project1/repo1'])
+    assert names(index.search('empty')) == (['empty'], [])
+    assert names(index.search('o', limit=1)) == (['project0'],
+                                                 ['project0/repo0'])
+
+
+def test_search_tags(index):
+    assert index.search_tags('xenial') == [('library/ubuntu', 'xenial'),
+                                           ('library/ubuntu-debug', 'xenial')]
+    assert index.search_tags('repo0:v2', project='project1') == [
+        ('project1/repo0', 'v2')
+    ]
+
+
+def test_background_refresh(harbor, client):
+    with SearchIndex(client, refresh_interval=0.05) as index:
+        assert not index.search('alpine')['repository']
+        harbor.add_tag(3, 'library/alpine', '3.4')
+        for _ in range(100):
+            if index.search('alpine')['repository']:
+                break
+            time.sleep(0.02)
+        assert names(index.search('alpine')) == ([], ['library/alpine'])
+
+
+def test_untagged_repositories_without_tag_requests(harbor, client):
+    harbor.add_tag(3, 'library/untagged', 'latest')
+    harbor.repositories['library/untagged']['tags'].clear()
+    with SearchIndex(client, tags=False) as index:
+        assert names(index.search('untagged')) == ([], ['library/untagged'])
+        assert index.search('untagged') == client.search('untagged')
+    assert '/api/repositories/tags' not in harbor.path_counts
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+
+import threading
+
+import pytest
+
+from harborclient.fakeharbor import FakeHarbor
+from harborclient.harborclient import HarborClient
+from harborclient.singleflight import SingleFlight
+
+
+def _run_together(count, func):
+    results = [None] * count
+    start = threading.Barrier(count)
+
+    def worker(index):
+        start.wait()
+        try:
+            results[index] = func()
+        except Exception as e:
+            results[index] = e
+
+    threads = [threading.Thread(target=worker, args=(i, ))
+               for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_single_flight_shares_result_and_error():
+    group = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        release.wait()
+        raise KeyError('boom')
+
+    timer = threading.Timer(0.2, release.set)
+    timer.start()
+    results = _run_together(10, lambda: group.do('key', slow))
+    assert len(calls) == 1
+    assert all(isinstance(r, KeyError) for r in results)
+    assert group.coalesced == 9
+
+    assert group.do('key', lambda: 42) == 42
+
+
+@pytest.mark.parametrize('status', [None, 503])
+def test_client_coalesces_identical_gets(status):
+    with FakeHarbor() as harbor:
+        client = HarborClient(harbor.host, harbor.user, harbor.password,
+                              threads=20, retry=None, coalesce=True)
+        client.get_statistics()
+        harbor.inject('/api/repositories/manifests', status, delay=0.3)
+        results = _run_together(20, lambda: (client.get_repository_manifests(
+            'project0/repo0', 'v0'), client.last_response.status_code))
+        assert harbor.path_counts['/api/repositories/manifests'] == 1
+        if status is None:
+            assert all(r[0]['manifest'] == results[0][0]['manifest']
+                       for r in results)
+            assert all(r[1] == 200 for r in results)
+        else:
+            assert results == [(None, 503)] * 20
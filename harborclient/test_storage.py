@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+
+from harborclient.fakeharbor import FakeHarbor
+from harborclient.harborclient import HarborClient
+from harborclient.storage import LayerIndex, manifest_blobs
+
+BASE = {'digest': 'sha256:' + 'b' * 64, 'size': 10000}
+SHARED = {'digest': 'sha256:' + 'c' * 64, 'size': 300}
+
+
+def test_layer_index():
+    index = LayerIndex()
+    index.add('a', 'a/web', 'v1', [(BASE['digest'], 100), ('x', 1)])
+    index.add('a', 'a/web', 'v2', [(BASE['digest'], 100), ('y', 2),
+                                   ('y', 2)])
+    index.add('b', 'b/db', 'v1', [(BASE['digest'], 100), ('z', 4)])
+    assert len(index) == 4
+    assert list(index) == [BASE['digest'], 'x', 'y', 'z']
+
+    layer = index.get(BASE['digest'])
+    assert layer.size == 100
+    assert layer.refcount == 3
+    assert layer.tags == [('a/web', 'v1'), ('a/web', 'v2'), ('b/db', 'v1')]
+    assert index.get('y').refcount == 1
+    assert index.get('missing') is None
+
+    report = index.report()
+    assert report.total_bytes == 107
+    assert report.logical_bytes == 307
+    assert report.shared_layers == 1
+    assert report.projects['a'] == (3, 100, 3, 2)
+    assert report.projects['b'] == (4, 100, 2, 1)
+    assert report.repositories['a/web'] == (3, 100, 3, 2)
+    assert report.freed_by_deleting('a') == 3
+    assert report.freed_by_deleting(repository='b/db') == 4
+
+
+def test_manifest_blobs():
+    manifest = {'manifest': {'fsLayers': [{'blobSum': 'sha256:1'}]}}
+    assert manifest_blobs(manifest) == [('sha256:1', 0)]
+    assert manifest_blobs(None) == []
+
+
+def test_analyze_storage():
+    harbor = FakeHarbor(projects=2, repositories=1, tags=1)
+    harbor.add_tag(1, 'project0/repo0', 'base', layers=[BASE, SHARED])
+    harbor.add_tag(1, 'project0/repo1', 'base', layers=[BASE])
+    harbor.add_tag(2, 'project1/repo0', 'base', layers=[SHARED])
+    with harbor:
+        with HarborClient(harbor.host, harbor.user, harbor.password,
+                          models=True) as client:
+            report = client.analyze_storage().report()
+
+    # Every tag has its own 512 byte config, the default tags also have
+    # two layers of their own
+    project0 = report.projects['project0']
+    assert project0.tags == 3
+    assert project0.unique_bytes == 512 * 3 + 1024 + 2048 + BASE['size']
+    assert project0.shared_bytes == SHARED['size']
+    repo0 = report.repositories['project0/repo0']
+    assert repo0.unique_bytes == 512 * 2 + 1024 + 2048
+    assert repo0.shared_bytes == BASE['size'] + SHARED['size']
+    assert report.total_bytes == (512 * 5 + (1024 + 2048) * 2 +
+                                  BASE['size'] + SHARED['size'])
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+
+import json
+
+import pytest
+
+from harborclient.fakeharbor import FakeHarbor
+from harborclient.harborclient import HarborClient
+from harborclient.streaming import iter_json_array
+
+
+def _chunks(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize('size', [1, 2, 5, 4096])
+def test_iter_json_array_any_chunking(size):
+    items = [1, 22, -3.5e3, "a]b,\"c", {"x": [1, {"y": u"\u00e9"}]}, [], None,
+             True, u"\u00fc" * 3, 7]
+    document = json.dumps(items).encode('utf-8')
+    assert list(iter_json_array(_chunks(document, size))) == items
+
+
+def test_iter_json_array_is_incremental():
+    def chunks():
+        yield b'[{"id": 1}, '
+        yield b'{"id": 2}, '
+        raise AssertionError("read past the second item")
+
+    parsed = iter_json_array(chunks())
+    assert next(parsed) == {"id": 1}
+    assert next(parsed) == {"id": 2}
+
+
+@pytest.mark.parametrize('document', [b'[1, 2', b'{"a": 1}', b'', b'[1 2]',
+                                      b'[1,]', b'[{"a": 1},\n ]', b'[,1]'])
+def test_iter_json_array_invalid(document):
+    with pytest.raises(ValueError):
+        list(iter_json_array([document]))
+
+
+def test_iter_json_array_fails_fast():
+    # A malformed item is reported without buffering the rest of the body
+    def chunks():
+        yield b'[{"id": 1}, {"id" 2}, '
+        yield b'{"id": 3}, '
+        raise AssertionError("read past the malformed item")
+
+    parsed = iter_json_array(chunks())
+    assert next(parsed) == {"id": 1}
+    with pytest.raises(ValueError, match='Invalid'):
+        next(parsed)
+
+
+def test_streamed_iterators():
+    with FakeHarbor(projects=1, repositories=30, tags=2) as harbor:
+        client = HarborClient(harbor.host, harbor.user, harbor.password)
+        logs = list(client.iter_logs(page_size=None, stream=True))
+        repositories = list(client.iter_repositories(1, page_size=7,
+                                                     stream=True))
+        assert logs == client.get_logs()
+        assert repositories == client.get_repositories(1)
+        assert len(repositories) == 30
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+
+import pytest
+
+from harborclient.exceptions import HarborError
+from harborclient.fakeharbor import FakeHarbor, _now, _timestamp
+from harborclient.harborclient import HarborClient
+from harborclient.sync import Change, Sync
+
+
+@pytest.fixture
+def harbor():
+    with FakeHarbor() as fake:
+        yield fake
+
+
+@pytest.fixture
+def client(harbor):
+    with HarborClient(harbor.host, harbor.user, harbor.password,
+                      retry=None) as client:
+        yield client
+
+
+def log_time(harbor):
+    # The fake logs one operation per second from a fixed start
+    return _timestamp(harbor.logs[-1]['op_time'])
+
+
+def test_bootstrap_and_poll(harbor, client):
+    sync = Sync(client, lag=0)
+    inventory = sync.bootstrap(now=log_time(harbor) + 1)
+    assert len(inventory) == 12
+    assert sorted(inventory.projects) == ['project0', 'project1']
+
+    client.create_project('project2')
+    harbor.add_tag(3, 'project2/app', 'v1')
+    client.delete_repository('project0/repo0', 'v0')
+    client.delete_repository('project1/repo1')
+    harbor.add_log(1, 'project0/repo1', 'v0', 'pull')
+
+    changes = sync.poll(now=log_time(harbor) + 1)
+    assert [(c.operation, c.repository, c.tag) for c in changes] == [
+        ('create', None, None), ('push', 'project2/app', 'v1'),
+        ('delete', 'project0/repo0', 'v0'),
+        ('delete', 'project1/repo1', 'v0'),
+        ('delete', 'project1/repo1', 'v1'),
+        ('delete', 'project1/repo1', 'v2')
+    ]
+    assert changes[0] == Change(harbor.logs[12]['log_id'],
+                                _timestamp(harbor.logs[12]['op_time']),
+                                'create', 'project2', None, None)
+    assert inventory.tags('project2/app') == ['v1']
+    assert inventory.tags('project0/repo0') == ['v1', 'v2']
+    assert 'project1/repo1' not in inventory.snapshot()
+    assert 'project2' in inventory.projects
+    assert sync.poll(now=log_time(harbor) + 1) == []
+
+
+def test_windows_apply_each_operation_once(harbor, client):
+    for index in range(3):
+        harbor.logs.append({'log_id': 100 + index, 'project_id': 1,
+                            'repo_name': 'project0/same', 'repo_tag':
+                            't%d' % index, 'operation': 'push',
+                            'op_time': _now(20)})
+    sync = Sync(client, since=_timestamp(_now(0)), window=2.5, lag=0)
+    changes = sync.poll(now=_timestamp(_now(30)))
+    assert len(changes) == 15
+    assert len(set(change.log_id for change in changes)) == 15
+    assert sync.inventory.tags('project0/same') == ['t0', 't1', 't2']
+    assert harbor.path_counts['/api/logs'] == 12
+
+
+def test_failed_window_keeps_mark(harbor, client):
+    since = _timestamp(_now(0))
+    sync = Sync(client, since=since, lag=0)
+    harbor.inject('/api/logs', 500)
+    with pytest.raises(HarborError):
+        sync.poll(now=log_time(harbor) + 1)
+    assert sync.mark == since
+    assert len(sync.poll(now=log_time(harbor) + 1)) == 12
+
+
+def test_poll_needs_mark(client):
+    with pytest.raises(ValueError):
+        Sync(client).poll()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+
+import threading
+import time
+
+from harborclient.fakeharbor import FakeHarbor
+from harborclient.harborclient import HarborClient
+
+THREADS = 200
+CALLS = 10
+
+
+def test_shared_client_stress():
+    with FakeHarbor(projects=2, repositories=5, tags=5) as harbor:
+        client = HarborClient(harbor.host, harbor.user, harbor.password,
+                              threads=THREADS)
+        start = threading.Barrier(THREADS + 1)
+        failures = []
+
+        def worker(index):
+            start.wait()
+            for i in range(CALLS):
+                repo = 'project%d/repo%d' % (index % 2, i % 5)
+                try:
+                    tags = client.get_repository_tags(repo)
+                    if tags != ['v0', 'v1', 'v2', 'v3', 'v4']:
+                        failures.append((repo, tags))
+                    elif client.last_response.status_code != 200:
+                        failures.append((repo,
+                                         client.last_response.status_code))
+                except Exception as e:
+                    failures.append((repo, e))
+
+        threads = [threading.Thread(target=worker, args=(i, ))
+                   for i in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        start.wait()
+        # Expire the session a few times while the workers run
+        for _ in range(3):
+            time.sleep(0.05)
+            harbor.expire_sessions()
+        for thread in threads:
+            thread.join()
+
+        assert failures == []
+        assert harbor.path_counts['/api/repositories/tags'] >= THREADS * CALLS
+        # One login at first use and at most a couple per expiry
+        assert harbor.login_count <= 1 + 3 * 2
+        assert harbor.connection_count <= THREADS